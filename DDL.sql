@@ -30,7 +30,44 @@ CREATE TABLE `stock_model` (
   `amplitude` decimal(5,2) DEFAULT NULL COMMENT '振幅(%)',
   `industry` varchar(50) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '所属行业',
   `events` json DEFAULT NULL COMMENT '炸板事件(JSON)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后写入时间',
   PRIMARY KEY (`id`),
-  KEY `idx_code_date` (`code`,`date`),
-  KEY `idx_date` (`date`)
-) ENGINE=InnoDB AUTO_INCREMENT=2346 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='股票涨停板数据模型'
\ No newline at end of file
+  UNIQUE KEY `uk_code_date` (`code`,`date`),
+  KEY `idx_date` (`date`),
+  KEY `idx_updated_at` (`updated_at`),
+  KEY `idx_dashboard_cover` (`date`,`limit_up_days`,`code`,`name`,`price`,`first_price`,`last_price`,`turnover_rate`,`real_turnover_rate`,`limit_up_statistics`,`dc_first_seal_time`,`dc_last_seal_time`,`dc_break_count`,`amplitude`,`industry`)
+) ENGINE=InnoDB AUTO_INCREMENT=2346 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='股票涨停板数据模型';
+
+CREATE TABLE `etl_state` (
+  `name` varchar(64) NOT NULL COMMENT '状态名称',
+  `value` varchar(255) DEFAULT NULL COMMENT '状态值',
+  `updated_at` datetime NOT NULL COMMENT '更新时间',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='增量任务运行状态(水位等)';
+
+CREATE TABLE `next_day_gap` (
+  `code` varchar(10) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '股票代码',
+  `date` date NOT NULL COMMENT '涨停日期',
+  `attempts` int(11) NOT NULL DEFAULT '1' COMMENT '未补齐的运行次数',
+  `updated_at` datetime NOT NULL COMMENT '更新时间',
+  PRIMARY KEY (`code`,`date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='水位之前仍缺少T+1数据的涨停行';
+
+CREATE TABLE `schema_migrations` (
+  `version` int(11) NOT NULL COMMENT '迁移版本',
+  `name` varchar(100) NOT NULL COMMENT '迁移名称',
+  `applied_at` datetime NOT NULL COMMENT '执行时间',
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据库结构迁移记录(migrate.py)';
+
+CREATE TABLE `stock_limit_event` (
+  `date` date NOT NULL COMMENT '日期',
+  `code` varchar(10) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '股票代码',
+  `seconds` int(11) NOT NULL COMMENT '事件时间(距0点秒数)',
+  `type` tinyint(4) NOT NULL COMMENT '事件类型: 1封板 2回封 3炸板',
+  `price` decimal(10,2) NOT NULL COMMENT '成交价格',
+  `volume` bigint(20) DEFAULT NULL COMMENT '成交量(手)，时间窗口法的事件为空',
+  PRIMARY KEY (`date`,`code`,`seconds`),
+  KEY `idx_date_type_seconds` (`date`,`type`,`seconds`),
+  KEY `idx_code_date` (`code`,`date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='封板/炸板事件(由 stock_model.events 拆分)';
@@ -0,0 +1,188 @@
+"""
+本地日线数据仓库
+
+所有需要 ak.stock_zh_a_hist 的脚本都通过 get_bars(code, start, end) 读取日线。
+数据按 (code, date) 存入本地 SQLite，并按代码记录已覆盖的日期区间，
+请求时只对未覆盖且包含交易日的区间访问网络，同一根日线在所有脚本和多次运行之间只下载一次。
+只有已收盘的日期会标记为已覆盖，当天盘中的半根日线下次仍会重新获取。
+接口返回空数据时，区间完全早于最近一个已收盘交易日的 (停牌、退市) 标记为已覆盖，
+不再每次运行都等待重新请求；区间包含最近交易日或当天时不标记，下次运行重新获取。
+
+统一存储不复权数据，振幅、成交量、换手率与复权方式无关。
+
+仓库文件位置: BAR_STORE_PATH，默认 ./data/bars.sqlite
+"""
+import logging
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+import trading_calendar
+
+STORE_PATH = os.getenv(
+    "BAR_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bars.sqlite")
+)
+
+# stock_zh_a_hist 列名 -> 本地列名
+BAR_COLUMNS = {
+    '日期': 'date',
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'pct_change',
+    '涨跌额': 'change',
+    '换手率': 'turnover_rate',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bar (
+    code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, close REAL, high REAL, low REAL,
+    volume INTEGER, amount REAL, amplitude REAL, pct_change REAL, change REAL, turnover_rate REAL,
+    PRIMARY KEY (code, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    code TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    PRIMARY KEY (code, start_date)
+);
+"""
+
+
+def _connect():
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _day(date):
+    return pd.Timestamp(date).normalize()
+
+
+def _coverage(conn, code):
+    rows = conn.execute(
+        "SELECT start_date, end_date FROM coverage WHERE code = ? ORDER BY start_date", (code,)
+    ).fetchall()
+    return [(_day(s), _day(e)) for s, e in rows]
+
+
+def _gaps(covered, start, end):
+    """[start, end] 中未被 covered 区间覆盖的子区间"""
+    gaps = []
+    cursor = start
+    for s, e in covered:
+        if e < cursor:
+            continue
+        if s > end:
+            break
+        if s > cursor:
+            gaps.append((cursor, min(end, s - pd.Timedelta(days=1))))
+        cursor = max(cursor, e + pd.Timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _mark_covered(conn, code, start, end):
+    """记录 [start, end] 已覆盖，并与相邻或重叠的区间合并"""
+    merged = []
+    for s, e in sorted(_coverage(conn, code) + [(start, end)]):
+        if merged and s <= merged[-1][1] + pd.Timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    conn.execute("DELETE FROM coverage WHERE code = ?", (code,))
+    conn.executemany(
+        "INSERT INTO coverage (code, start_date, end_date) VALUES (?, ?, ?)",
+        [(code, s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in merged]
+    )
+
+
+def _sql_value(value):
+    # sqlite3 不接受 numpy 数值类型
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _fetch(code, start, end, sleep_range):
+    import akshare as ak
+
+    wait = random.randrange(*sleep_range)
+    logging.info("fetching bars %s [%s-%s], sleep %ds", code, start.date(), end.date(), wait)
+    time.sleep(wait)
+    df = ak.stock_zh_a_hist(
+        symbol=code, period="daily",
+        start_date=start.strftime('%Y%m%d'), end_date=end.strftime('%Y%m%d'), adjust=""
+    )
+    if df is None or df.empty or '日期' not in df.columns:
+        return pd.DataFrame(columns=list(BAR_COLUMNS.values()))
+    df = df[[col for col in BAR_COLUMNS if col in df.columns]].rename(columns=BAR_COLUMNS)
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    return df
+
+
+def get_bars(code, start_date, end_date, sleep_range=(40, 60)):
+    """
+    读取日线，本地未覆盖的区间先从网络补齐
+
+    参数:
+    code: 股票代码，只取后6位
+    start_date: 开始日期
+    end_date: 结束日期
+    sleep_range: 访问网络前随机等待的秒数范围
+
+    返回:
+    DataFrame: 与 ak.stock_zh_a_hist 列名一致 (日期为 yyyy-mm-dd 字符串)，按日期升序
+    """
+    code = str(code)[-6:]
+    start, end = _day(start_date), _day(end_date)
+    closed = trading_calendar.last_closed_day()
+    with closing(_connect()) as conn:
+        for gap_start, gap_end in _gaps(_coverage(conn, code), start, end):
+            # 区间内没有交易日时不需要请求，直接标记已覆盖
+            if len(trading_calendar.trading_days_between(gap_start, gap_end)) == 0:
+                if gap_end <= closed:
+                    with conn:
+                        _mark_covered(conn, code, gap_start, gap_end)
+                continue
+            bars = _fetch(code, gap_start, gap_end, sleep_range)
+            if bars.empty:
+                # 已过去的区间没有日线视为停牌或退市，记录空覆盖避免每次运行重复请求
+                if gap_end < closed:
+                    logging.warning("no bars returned for %s [%s-%s], marking covered as suspended", code, gap_start.date(), gap_end.date())
+                    with conn:
+                        _mark_covered(conn, code, gap_start, gap_end)
+                else:
+                    # 包含最近交易日时可能只是数据尚未更新或限流，保持未覆盖，下次运行重新获取
+                    logging.warning("no bars returned for %s [%s-%s], leaving uncovered", code, gap_start.date(), gap_end.date())
+                continue
+            columns = list(BAR_COLUMNS.values())
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO bar (code, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+                    [(code, *(_sql_value(v) for v in row))
+                     for row in bars.reindex(columns=columns).itertuples(index=False)]
+                )
+                # 只标记已收盘的部分，当天盘中数据下次重新获取
+                if gap_start <= closed:
+                    _mark_covered(conn, code, gap_start, min(gap_end, closed))
+        df = pd.read_sql_query(
+            "SELECT * FROM bar WHERE code = ? AND date BETWEEN ? AND ? ORDER BY date",
+            conn, params=(code, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        )
+    return df.drop(columns=['code']).rename(columns={v: k for k, v in BAR_COLUMNS.items()})
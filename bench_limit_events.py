@@ -0,0 +1,390 @@
+"""
+涨停事件检测基准测试
+
+在合成的高活跃度分笔数据上对比原始逐行实现 (650f05a:make_data.py 原样保留) 与
+limit_events 中的数组实现，校验两者输出的事件非空且完全一致，并打印耗时。
+
+用法:
+python bench_limit_events.py --ticks 5000 20000 50000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import limit_events
+
+LIMIT_PRICE = 10.0
+
+
+def synth_tick_day(n, seed=0, switch_prob=0.01):
+    """
+    生成一天的合成分笔数据，价格在封板/开板两种状态间频繁切换
+
+    封板段至少3笔涨停价成交、开板段至少2笔低于涨停价成交，每次触板和跌破都能被
+    identify_limit_events 的后续笔确认，不会因候选未确认而停止产生事件
+
+    参数:
+    n: 成交笔数
+    seed: 随机种子
+    switch_prob: 每笔成交切换状态的概率，越大炸板回封越频繁
+
+    返回:
+    DataFrame: 与 ak.stock_zh_a_tick_tx_js 列一致的分笔数据
+    """
+    rng = np.random.default_rng(seed)
+    trading_seconds = np.concatenate([
+        np.arange(9 * 3600 + 30 * 60, 11 * 3600 + 30 * 60),
+        np.arange(13 * 3600, 15 * 3600)
+    ])
+    seconds = np.sort(rng.choice(trading_seconds, size=n, replace=True))
+    # 从开板段开始交替，段长为几何分布加上确认所需的最少笔数
+    run_sealed = np.arange(n) % 2 == 1
+    run_lengths = rng.geometric(switch_prob, size=n) + np.where(run_sealed, 2, 1)
+    sealed = np.repeat(run_sealed, run_lengths)[:n]
+    below = LIMIT_PRICE - np.round(rng.random(n) * 0.3, 2) - 0.01
+    prices = np.where(sealed, LIMIT_PRICE, below)
+    volumes = rng.integers(1, 2000, n)
+    return pd.DataFrame({
+        '成交时间': [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in seconds],
+        '成交价格': prices,
+        '价格变动': np.concatenate(([0.0], np.diff(prices))),
+        '成交量': volumes,
+        '成交金额': (prices * volumes * 100).astype(np.int64),
+        '性质': rng.choice(['买盘', '卖盘', '中性盘'], n)
+    })
+
+
+# 以下参考实现原样取自 650f05a:make_data.py (迁移到 limit_events.py 之前的逐行实现)，不做任何改动
+
+def identify_limit_events(tick_df, limit_price):
+    """
+    基于分笔数据识别涨停事件
+
+    参数:
+    tick_df: 分笔数据DataFrame
+    limit_price: 涨停价
+
+    返回:
+    dict: 包含封板、炸板和回封事件的字典
+    """
+    # 初始化状态变量
+    state = "未封板"  # 可能状态: "未封板", "封板", "炸板"
+    events = []
+    current_seal_start = None
+    current_break_start = None
+
+    # 存储临时状态
+    seal_candidate = False
+    seal_candidate_time = None
+    break_candidate = False
+    break_candidate_time = None
+
+    # 遍历每一笔成交
+    for i, row in tick_df.iterrows():
+        current_time = row['时间对象']
+        current_price = row['成交价格']
+        volume = row['成交量']
+
+        # 状态: 未封板
+        if state == "未封板":
+            if current_price >= limit_price:
+                # 首次达到涨停价，标记为封板候选
+                if not seal_candidate:
+                    seal_candidate = True
+                    seal_candidate_time = current_time
+                    # 检查后续几笔确认
+                    confirm_count = 0
+                    for j in range(i + 1, min(i + 4, len(tick_df))):  # 查看后续3笔
+                        if tick_df.iloc[j]['成交价格'] >= limit_price:
+                            confirm_count += 1
+
+                    if confirm_count >= 2:  # 后续至少有2笔确认
+                        state = "封板"
+                        current_seal_start = seal_candidate_time
+                        events.append({
+                            '时间': seal_candidate_time,
+                            '类型': '封板',
+                            '价格': current_price,
+                            '成交量': volume
+                        })
+                        seal_candidate = False
+
+        # 状态: 封板
+        elif state == "封板":
+            if current_price < limit_price:
+                # 价格跌破涨停价，标记为炸板候选
+                if not break_candidate:
+                    break_candidate = True
+                    break_candidate_time = current_time
+                    # 检查后续几笔确认
+                    confirm_count = 0
+                    for j in range(i + 1, min(i + 3, len(tick_df))):  # 查看后续2笔
+                        if tick_df.iloc[j]['成交价格'] < limit_price:
+                            confirm_count += 1
+
+                    if confirm_count >= 1:  # 后续至少有1笔确认
+                        state = "炸板"
+                        events.append({
+                            '时间': break_candidate_time,
+                            '类型': '炸板',
+                            '价格': current_price,
+                            '成交量': volume
+                        })
+                        break_candidate = False
+                        current_break_start = break_candidate_time
+
+        # 状态: 炸板
+        elif state == "炸板":
+            if current_price >= limit_price:
+                # 价格再次达到涨停价，标记为回封候选
+                if not seal_candidate:
+                    seal_candidate = True
+                    seal_candidate_time = current_time
+                    # 检查后续几笔确认
+                    confirm_count = 0
+                    for j in range(i + 1, min(i + 4, len(tick_df))):  # 查看后续3笔
+                        if tick_df.iloc[j]['成交价格'] >= limit_price:
+                            confirm_count += 1
+
+                    if confirm_count >= 2:  # 后续至少有2笔确认
+                        state = "封板"
+                        events.append({
+                            '时间': seal_candidate_time,
+                            '类型': '回封',
+                            '价格': current_price,
+                            '成交量': volume
+                        })
+                        seal_candidate = False
+                        current_seal_start = seal_candidate_time
+
+    return events
+
+
+def identify_with_time_window(tick_df, limit_price, time_window_seconds=30):
+    """
+    使用时间窗口确认涨停事件
+
+    参数:
+    tick_df: 分笔数据DataFrame
+    limit_price: 涨停价
+    time_window_seconds: 确认时间窗口(秒)
+
+    返回:
+    list: 事件列表
+    """
+    events = []
+    state = "未封板"
+    last_event_time = None
+
+    for i, row in tick_df.iterrows():
+        current_time = row['时间对象']
+        current_price = row['成交价格']
+
+        # 封板检测
+        if state in ["未封板", "炸板"] and current_price >= limit_price:
+            # 查找时间窗口内的后续交易
+            window_end = current_time + timedelta(seconds=time_window_seconds)
+            window_data = tick_df[(tick_df['时间对象'] >= current_time) &
+                                  (tick_df['时间对象'] <= window_end)]
+
+            # 计算窗口中涨停价交易的比例
+            limit_trades = len(window_data[window_data['成交价格'] >= limit_price])
+            total_trades = len(window_data)
+
+            if total_trades > 0 and limit_trades / total_trades > 0.7:  # 70%以上在涨停价
+                event_type = "回封" if state == "炸板" else "封板"
+                events.append({
+                    '时间': current_time,
+                    '类型': event_type,
+                    '价格': current_price
+                })
+                state = "封板"
+                last_event_time = current_time
+
+        # 炸板检测
+        elif state == "封板" and current_price < limit_price:
+            # 查找时间窗口内的后续交易
+            window_end = current_time + timedelta(seconds=time_window_seconds)
+            window_data = tick_df[(tick_df['时间对象'] >= current_time) &
+                                  (tick_df['时间对象'] <= window_end)]
+
+            # 计算窗口中低于涨停价交易的比例
+            below_limit_trades = len(window_data[window_data['成交价格'] < limit_price])
+            total_trades = len(window_data)
+
+            if total_trades > 0 and below_limit_trades / total_trades > 0.6:  # 60%以上低于涨停价
+                events.append({
+                    '时间': current_time,
+                    '类型': '炸板',
+                    '价格': current_price
+                })
+                state = "炸板"
+                last_event_time = current_time
+
+    return events
+
+
+def advanced_limit_detection(tick_df, limit_price):
+    """
+    高级涨停事件检测，考虑成交量与价格变动
+    """
+    events = []
+    state = "未封板"
+    seal_streak = 0  # 连续涨停计数
+    break_streak = 0  # 连续非涨停计数
+
+    # 计算平均成交量
+    avg_volume = tick_df['成交量'].mean()
+
+    for i, row in tick_df.iterrows():
+        current_time = row['时间对象']
+        current_price = row['成交价格']
+        current_volume = row['成交量']
+        price_change = row['价格变动']
+
+        # 封板检测
+        if state != "封板" and current_price >= limit_price:
+            # 大成交量涨停更可能是真封板
+            volume_ratio = current_volume / avg_volume
+            if volume_ratio > 0.8:  # 成交量大于平均值的80%
+                seal_streak += 1
+                break_streak = 0
+
+                if seal_streak >= 2:  # 连续2笔涨停价成交
+                    event_type = "回封" if state == "炸板" else "封板"
+                    events.append({
+                        '时间': current_time,
+                        '类型': event_type,
+                        '价格': current_price,
+                        '成交量': current_volume
+                    })
+                    state = "封板"
+                    seal_streak = 0
+            else:
+                seal_streak = 0
+
+        # 炸板检测
+        elif state == "封板" and current_price < limit_price:
+            # 大成交量下跌更可能是真炸板
+            volume_ratio = current_volume / avg_volume
+            if volume_ratio > 0.5:  # 成交量大于平均值的50%
+                break_streak += 1
+                seal_streak = 0
+
+                if break_streak >= 2:  # 连续2笔非涨停价成交
+                    events.append({
+                        '时间': current_time,
+                        '类型': '炸板',
+                        '价格': current_price,
+                        '成交量': current_volume
+                    })
+                    state = "炸板"
+                    break_streak = 0
+            else:
+                break_streak = 0
+
+    return events
+
+
+# 合并结果并进行投票
+def merge_events(df, limit_price):
+    # 方法1: 基于状态机的方法
+    events1 = identify_limit_events(df, limit_price)
+
+    # 方法2: 基于时间窗口的方法
+    events2 = identify_with_time_window(df, limit_price, time_window_seconds=30)
+
+    # 方法3: 高级检测方法
+    events3 = advanced_limit_detection(df, limit_price)
+
+    events_list = [events1, events2, events3]
+
+    """合并多个方法的结果"""
+    from collections import defaultdict
+
+    # 按时间分组事件
+    time_groups = defaultdict(list)
+    for events in events_list:
+        for event in events:
+            time_key = event['时间'].strftime('%H:%M:%S')
+            time_groups[time_key].append(event['类型'])
+
+    # 对每个时间点进行投票
+    merged_events = []
+    for time_key, types in time_groups.items():
+        # 计算每种类型的票数
+        from collections import Counter
+        type_counts = Counter(types)
+        most_common_type, count = type_counts.most_common(1)[0]
+
+        # 如果至少有两种方法同意，则采纳
+        if count >= 2:
+            # 找到原始事件获取详细信息
+            for events in events_list:
+                for event in events:
+                    if event['时间'].strftime('%H:%M:%S') == time_key and event['类型'] == most_common_type:
+                        merged_events.append(event)
+                        break
+                if any(event['时间'].strftime('%H:%M:%S') == time_key for event in merged_events):
+                    break
+
+    return merged_events
+
+
+def timed(func, *args, repeat=1):
+    """返回 (结果, 最短耗时秒数)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+# (名称, 参考实现, 数组实现)
+DETECTORS = [
+    ('identify_limit_events', lambda df: identify_limit_events(df, LIMIT_PRICE),
+     lambda df: limit_events.identify_limit_events(df, LIMIT_PRICE)),
+    ('identify_with_time_window', lambda df: identify_with_time_window(df, LIMIT_PRICE, 30),
+     lambda df: limit_events.identify_with_time_window(df, LIMIT_PRICE, 30)),
+    ('advanced_limit_detection', lambda df: advanced_limit_detection(df, LIMIT_PRICE),
+     lambda df: limit_events.advanced_limit_detection(df, LIMIT_PRICE)),
+    ('merge_events', lambda df: merge_events(df, LIMIT_PRICE),
+     lambda df: limit_events.merge_events(df, LIMIT_PRICE)),
+]
+
+
+def run(ticks, skip_reference_above):
+    print(f"{'笔数':>8} {'检测器':<28} {'事件数':>6} {'参考(s)':>10} {'数组(s)':>10} {'加速比':>8}")
+    for n in ticks:
+        tick_df = synth_tick_day(n, seed=n)
+        tick_df['时间对象'] = pd.to_datetime(tick_df['成交时间'], format='%H:%M:%S')
+        for name, reference, fast_func in DETECTORS:
+            fast, fast_time = timed(fast_func, tick_df, repeat=3)
+            # 没有事件时一致性校验没有意义
+            if not fast:
+                raise AssertionError(f"{name} 在 {n} 笔合成数据上没有识别出事件")
+            if n > skip_reference_above:
+                print(f"{n:>8} {name:<28} {len(fast):>6} {'-':>10} {fast_time:>10.4f} {'-':>8}")
+                continue
+            ref, ref_time = timed(reference, tick_df)
+            if ref != fast:
+                raise AssertionError(f"{name} 在 {n} 笔数据上两种实现的事件不一致")
+            print(f"{n:>8} {name:<28} {len(fast):>6} {ref_time:>10.4f} {fast_time:>10.4f} {ref_time / fast_time:>7.0f}x")
+
+
+def main():
+    p = argparse.ArgumentParser(description="涨停事件检测基准测试")
+    p.add_argument("--ticks", type=int, nargs="+", default=[5000, 20000, 50000], help="每个合成交易日的成交笔数")
+    p.add_argument("--skip-reference-above", type=int, default=50000, help="超过该笔数时不运行参考实现")
+    args = p.parse_args()
+    run(args.ticks, args.skip_reference_above)
+
+
+if __name__ == "__main__":
+    main()
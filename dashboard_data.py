@@ -0,0 +1,280 @@
+"""
+看板数据查询
+
+看板和迁移脚本共用同一条查询，迁移脚本用它对比加索引前后的执行计划和耗时。
+查询只取看板实际用到的列，这些列全部包含在覆盖索引 idx_dashboard_cover 中。
+
+DASHBOARD_BACKEND=duckdb 时所有查询改为读取本地镜像 (mirror_sync.py)，默认 mysql。
+查询只使用两种库都支持的语法，日期等参数由 Python 计算后传入。
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import db
+import mirror_sync
+
+BACKEND = os.getenv("DASHBOARD_BACKEND", "mysql").lower()
+
+# 看板用到的列，顺序与覆盖索引一致 (date, limit_up_days 在前，用于范围扫描和排序)
+DASHBOARD_COLUMNS = (
+    'date', 'limit_up_days', 'code', 'name', 'price', 'first_price', 'last_price',
+    'turnover_rate', 'real_turnover_rate', 'limit_up_statistics',
+    'dc_first_seal_time', 'dc_last_seal_time', 'dc_break_count', 'amplitude', 'industry'
+)
+
+# 看板查询的 SELECT 列表，全量查询和增量查询共用
+DASHBOARD_SELECT = """
+    date,
+    name,
+    code,
+    price,
+    first_price,
+    last_price,
+    turnover_rate,
+    real_turnover_rate,
+    limit_up_days,
+    limit_up_statistics,
+    dc_first_seal_time,
+    dc_last_seal_time,
+    dc_break_count as break_count,
+    amplitude,
+    industry
+"""
+
+DASHBOARD_QUERY = f"""
+SELECT {DASHBOARD_SELECT.rstrip()}
+FROM stock_model
+WHERE date >= :min_date
+ORDER BY date DESC, limit_up_days DESC
+"""
+
+
+def read_sql(engine, sql, params=None):
+    """
+    按 BACKEND 在 MySQL 或本地镜像上执行查询
+
+    参数:
+    engine: MySQL 引擎，BACKEND 为 duckdb 时不使用
+    sql: 使用 :name 命名参数的查询
+
+    返回:
+    DataFrame
+    """
+    if BACKEND == 'duckdb':
+        with mirror_sync.connect() as conn:
+            return conn.execute(re.sub(r'(?<![:\w]):(\w+)', r'$\1', sql), params or {}).df()
+    with engine.connect() as conn:
+        return pd.read_sql(text(sql), conn, params=params)
+
+
+def load_data_version(engine):
+    """
+    返回:
+    str: 当前数据版本，BACKEND 为 duckdb 时为镜像同步到的版本
+    """
+    if BACKEND == 'duckdb':
+        return mirror_sync.synced_data_version()
+    with engine.connect() as conn:
+        return db.get_data_version(conn=conn)
+
+
+def load_db_now(engine):
+    """
+    数据库的当前时间，实时模式以此作为增量起点，不受本机时钟偏差影响
+    BACKEND 为 duckdb 时镜像中的时间都来自 MySQL，取镜像中最新的 updated_at
+
+    返回:
+    Timestamp: 镜像为空时为 NaT
+    """
+    sql = "SELECT MAX(updated_at) AS now FROM stock_model" if BACKEND == 'duckdb' else "SELECT NOW() AS now"
+    return pd.Timestamp(read_sql(engine, sql)['now'].iloc[0])
+
+
+def days_ago(days):
+    """最近 days 个自然日的起始日期"""
+    return (pd.Timestamp.now().normalize() - pd.Timedelta(days=days)).date()
+
+
+def load_stock_data(engine, days=90):
+    """
+    读取最近 days 天的看板数据
+
+    返回:
+    DataFrame: date 列为 datetime.date
+    """
+    df = read_sql(engine, DASHBOARD_QUERY, {"min_date": days_ago(days)})
+
+    # 确保日期格式一致
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    return df
+
+
+def load_limit_events(engine, date):
+    """
+    读取某一天全部股票的封板/炸板事件 (主键 date, code, seconds 范围扫描)
+
+    返回:
+    DataFrame: code, seconds, type, price, volume，按时间排序
+    """
+    return read_sql(
+        engine,
+        """
+        SELECT code, seconds, type, price, volume
+        FROM stock_limit_event
+        WHERE date = :date
+        ORDER BY seconds
+        """,
+        {"date": date}
+    )
+
+
+def load_break_histogram(engine, date, bucket_seconds=300):
+    """
+    按时间段统计某一天的炸板次数 (索引 idx_date_type_seconds)
+
+    返回:
+    DataFrame: bucket (时间段起点，距0点秒数), break_count
+    """
+    return read_sql(
+        engine,
+        """
+        SELECT FLOOR(seconds / :bucket) * :bucket AS bucket, COUNT(*) AS break_count
+        FROM stock_limit_event
+        WHERE date = :date AND type = 3
+        GROUP BY bucket
+        ORDER BY bucket
+        """,
+        {"date": date, "bucket": bucket_seconds}
+    )
+
+
+CHANGES_QUERY = f"""
+SELECT {DASHBOARD_SELECT.rstrip()},
+    updated_at
+FROM stock_model
+WHERE updated_at >= :since AND date >= :min_date
+ORDER BY updated_at
+"""
+
+
+def load_changes_since(engine, since, min_date):
+    """
+    增量读取 updated_at 不早于 since 的行 (索引 idx_updated_at)
+    updated_at 为秒级精度，since 当秒之后提交的行仍会读到，重复读取的行由 merge_changes 去重
+
+    参数:
+    since: 上次读取到的最大 updated_at
+    min_date: 只读取该日期及之后的行
+
+    返回:
+    DataFrame: 看板列加 updated_at
+    """
+    df = read_sql(engine, CHANGES_QUERY, {"since": since, "min_date": min_date})
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    return df
+
+
+def merge_changes(frame, changes):
+    """
+    把增量行合并进内存中的数据，同一 (code, date) 以新行为准
+
+    返回:
+    DataFrame: 合并后的数据
+    """
+    if changes is None or changes.empty:
+        return frame
+    merged = pd.concat([frame, changes.drop(columns=['updated_at'], errors='ignore')], ignore_index=True)
+    return merged.drop_duplicates(['code', 'date'], keep='last').reset_index(drop=True)
+
+
+# 回放从 9:15 开始，未封板的行 (次日数据等) 在收盘时出现
+REPLAY_START_SECONDS = 9 * 3600 + 15 * 60
+REPLAY_CLOSE_SECONDS = 15 * 3600
+
+
+def replay_changes(day_df, elapsed_seconds, since_seconds, speed=60):
+    """
+    用历史某一天的数据模拟盘中增量，代替 load_changes_since 驱动实时模式
+
+    模拟时钟 = 9:15 + 实际经过秒数 * speed，东财首次封板时间不晚于模拟时钟的行视为已写入。
+
+    参数:
+    day_df: 回放日期的全部行
+    elapsed_seconds: 开始回放后实际经过的秒数
+    since_seconds: 上次回放到的模拟时钟 (距0点秒数)
+    speed: 回放倍速
+
+    返回:
+    tuple: (本次新出现的行, 当前模拟时钟)
+    """
+    clock = min(REPLAY_CLOSE_SECONDS, REPLAY_START_SECONDS + elapsed_seconds * speed)
+    seal_seconds = pd.to_timedelta(day_df['dc_first_seal_time']).dt.total_seconds().fillna(REPLAY_CLOSE_SECONDS)
+    return day_df[(seal_seconds > since_seconds) & (seal_seconds <= clock)], clock
+
+
+def industry_daily_stats(df):
+    """
+    按 (日期, 行业) 一次聚合涨停数、最高板、晋级率，行业轮动热力图按日期范围切片使用
+
+    晋级率 = 当天该行业2板及以上数量 / 前一交易日该行业涨停数量 * 100，前一交易日该行业无涨停时为空。
+
+    返回:
+    DataFrame: date, industry, limit_up_count, max_height, advanced_count, prev_limit_up_count,
+    advancement_rate, rank (当天按涨停数、最高板排名，1为领涨行业)，按 date 升序
+    """
+    data = df[df['limit_up_days'].notna()]
+    data = data.assign(industry=data['industry'].fillna('未知'), advanced=data['limit_up_days'] >= 2)
+    stats = data.groupby(['date', 'industry']).agg(
+        limit_up_count=('code', 'size'),
+        max_height=('limit_up_days', 'max'),
+        advanced_count=('advanced', 'sum')
+    ).reset_index()
+
+    # 前一交易日取数据中的上一个日期，与情绪值中晋级率的口径一致
+    dates = sorted(df['date'].unique())
+    stats['prev_date'] = stats['date'].map(dict(zip(dates[1:], dates[:-1])))
+    prev = stats[['date', 'industry', 'limit_up_count']].rename(
+        columns={'date': 'prev_date', 'limit_up_count': 'prev_limit_up_count'}
+    )
+    stats = stats.merge(prev, on=['prev_date', 'industry'], how='left')
+    stats['advancement_rate'] = stats['advanced_count'] / stats['prev_limit_up_count'] * 100
+
+    stats = stats.sort_values(['date', 'limit_up_count', 'max_height'], ascending=[True, False, False])
+    stats['rank'] = stats.groupby('date').cumcount() + 1
+    return stats.drop(columns=['prev_date']).reset_index(drop=True)
+
+
+def build_code_index(df):
+    """
+    按 code 排序数据并建立 code -> (start, stop) 行范围索引，单只股票的历史只需切片，不再全表扫描
+
+    返回:
+    tuple: (按 code, date 排序的 DataFrame, {code: (start, stop)})
+    """
+    by_code = df.sort_values(['code', 'date'], kind='stable').reset_index(drop=True)
+    codes, starts = np.unique(by_code['code'].to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(by_code))
+    return by_code, {code: (int(start), int(stop)) for code, start, stop in zip(codes, starts, stops)}
+
+
+def stock_history(by_code, index, code):
+    """
+    读取单只股票的全部行，并计算涨停次日的开盘/收盘溢价率 (口径同看板溢价率分析)
+
+    参数:
+    by_code, index: build_code_index 的结果
+    code: 股票代码
+
+    返回:
+    DataFrame: 按日期升序，不存在时为空
+    """
+    start, stop = index.get(code, (0, 0))
+    history = by_code.iloc[start:stop].copy()
+    limit_up = history['limit_up_days'].notna()
+    history['opening_premium_rate'] = ((history['first_price'].shift(-1) - history['price']) / history['price'] * 100).where(limit_up)
+    history['closing_premium_rate'] = ((history['last_price'].shift(-1) - history['price']) / history['price'] * 100).where(limit_up)
+    return history
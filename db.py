@@ -0,0 +1,259 @@
+"""
+数据库访问层
+
+所有脚本共用同一个连接池引擎，避免每次查询都重新建立连接。
+连接参数从环境变量读取，代码中不保存任何连接信息:
+    OPS_DB_HOST / OPS_DB_USER / OPS_DB_PASSWORD / OPS_DB_DATABASE (必填) / OPS_DB_CHARSET (默认 utf8mb4)
+连接池参数:
+    OPS_DB_POOL_SIZE (默认5) / OPS_DB_MAX_OVERFLOW (默认10) / OPS_DB_POOL_RECYCLE (默认3600秒)
+"""
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+DEFAULT_CHARSET = 'utf8mb4'
+
+# 按 DSN 缓存的引擎，同一进程内复用连接池
+_engines = {}
+
+
+def build_dsn(host=None, user=None, password=None, database=None, charset=None):
+    """
+    构造 mysql+pymysql 连接串，未传入的参数取环境变量 OPS_DB_*
+
+    返回:
+    str: SQLAlchemy DSN
+
+    异常:
+    RuntimeError: 必填的连接参数既未传入也未设置环境变量
+    """
+    host = host or os.getenv("OPS_DB_HOST")
+    user = user or os.getenv("OPS_DB_USER")
+    password = password or os.getenv("OPS_DB_PASSWORD")
+    database = database or os.getenv("OPS_DB_DATABASE")
+    charset = charset or os.getenv("OPS_DB_CHARSET") or DEFAULT_CHARSET
+    missing = [name for name, value in (
+        ("OPS_DB_HOST", host), ("OPS_DB_USER", user), ("OPS_DB_PASSWORD", password), ("OPS_DB_DATABASE", database)
+    ) if not value]
+    if missing:
+        raise RuntimeError(f"缺少数据库连接配置，请设置环境变量: {', '.join(missing)}")
+    return f"mysql+pymysql://{user}:{password}@{host}/{database}?charset={charset}"
+
+
+def get_engine(dsn=None):
+    """
+    获取带连接池的引擎，同一 DSN 在进程内只创建一次
+
+    参数:
+    dsn: 连接串，为空时使用 build_dsn() 的结果
+
+    返回:
+    Engine: SQLAlchemy 引擎
+    """
+    dsn = dsn or build_dsn()
+    engine = _engines.get(dsn)
+    if engine is None:
+        engine = create_engine(
+            dsn,
+            pool_size=int(os.getenv("OPS_DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("OPS_DB_MAX_OVERFLOW", "10")),
+            pool_recycle=int(os.getenv("OPS_DB_POOL_RECYCLE", "3600")),
+            pool_pre_ping=True
+        )
+        _engines[dsn] = engine
+    return engine
+
+
+@contextmanager
+def transaction(dsn=None):
+    """
+    事务上下文: 正常退出时提交，出现异常时回滚
+
+    用法:
+    with transaction() as conn:
+        execute("UPDATE ...", {...}, conn=conn)
+    """
+    with get_engine(dsn).begin() as conn:
+        yield conn
+
+
+@contextmanager
+def _connection(conn):
+    # 传入连接时复用调用方的事务，否则从连接池借一个只读连接
+    if conn is not None:
+        yield conn
+    else:
+        with get_engine().connect() as new_conn:
+            yield new_conn
+
+
+def fetch_all(sql, params=None, conn=None):
+    """
+    执行查询并返回全部行
+
+    返回:
+    list: 每行一个 dict
+    """
+    with _connection(conn) as c:
+        result = c.execute(text(sql), params or {})
+        return [dict(row) for row in result.mappings()]
+
+
+def fetch_one(sql, params=None, conn=None):
+    """
+    执行查询并返回第一行
+
+    返回:
+    dict | None: 第一行数据，无结果时返回 None
+    """
+    with _connection(conn) as c:
+        row = c.execute(text(sql), params or {}).mappings().first()
+        return dict(row) if row is not None else None
+
+
+def fetch_scalar(sql, params=None, conn=None):
+    """
+    执行查询并返回第一行第一列的值
+    """
+    with _connection(conn) as c:
+        return c.execute(text(sql), params or {}).scalar()
+
+
+def read_df(sql, params=None, conn=None):
+    """
+    执行查询并返回 DataFrame
+    """
+    with _connection(conn) as c:
+        return pd.read_sql(text(sql), c, params=params or {})
+
+
+def execute(sql, params=None, conn=None):
+    """
+    执行写语句，params 为 list 时按 executemany 批量执行
+    未传入 conn 时在独立事务中执行并提交
+
+    返回:
+    int: 受影响行数
+    """
+    if conn is not None:
+        return conn.execute(text(sql), params or {}).rowcount
+    with transaction() as c:
+        return c.execute(text(sql), params or {}).rowcount
+
+
+# 增量任务的水位等运行状态，name -> value
+ETL_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS etl_state (
+  name varchar(64) NOT NULL,
+  value varchar(255) DEFAULT NULL,
+  updated_at datetime NOT NULL,
+  PRIMARY KEY (name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+# 已确认存在 etl_state 的引擎 url
+_state_table_ready = set()
+
+
+def _ensure_state_table(conn=None):
+    # CREATE TABLE 会隐式提交当前事务，因此在独立连接上执行，每个库只执行一次
+    engine = conn.engine if conn is not None else get_engine()
+    key = str(engine.url)
+    if key not in _state_table_ready:
+        with engine.begin() as c:
+            c.execute(text(ETL_STATE_DDL))
+        _state_table_ready.add(key)
+
+
+def get_state(name, default=None, conn=None):
+    """
+    读取 etl_state 中的状态值
+
+    返回:
+    str | default: 不存在时返回 default
+    """
+    _ensure_state_table(conn)
+    with _connection(conn) as c:
+        value = c.execute(text("SELECT value FROM etl_state WHERE name = :name"), {"name": name}).scalar()
+    return default if value is None else value
+
+
+def set_state(name, value, conn=None):
+    """写入 etl_state 中的状态值，已存在时覆盖"""
+    stmt = """
+        INSERT INTO etl_state (name, value, updated_at) VALUES (:name, :value, NOW())
+        ON DUPLICATE KEY UPDATE value = VALUES(value), updated_at = VALUES(updated_at)
+    """
+    if conn is None:
+        with transaction() as c:
+            return set_state(name, value, conn=c)
+    _ensure_state_table(conn)
+    conn.execute(text(stmt), {"name": name, "value": None if value is None else str(value)})
+
+
+# 写入 stock_model / stock_limit_event 后递增，看板据此判断是否需要重新加载
+DATA_VERSION_STATE = "data_version"
+
+
+def get_data_version(conn=None):
+    """
+    返回:
+    str: 当前数据版本，从未写入过时为 '0'
+    """
+    return get_state(DATA_VERSION_STATE, "0", conn=conn)
+
+
+def bump_data_version(conn=None):
+    """数据版本加1，应在写入数据的同一事务内调用"""
+    stmt = """
+        INSERT INTO etl_state (name, value, updated_at) VALUES (:name, '1', NOW())
+        ON DUPLICATE KEY UPDATE value = CAST(value AS UNSIGNED) + 1, updated_at = VALUES(updated_at)
+    """
+    if conn is None:
+        with transaction() as c:
+            return bump_data_version(conn=c)
+    _ensure_state_table(conn)
+    conn.execute(text(stmt), {"name": DATA_VERSION_STATE})
+
+
+def table_exists(name, conn=None):
+    """当前库中是否存在表 name"""
+    with _connection(conn) as c:
+        return c.execute(
+            text(
+                """
+                SELECT COUNT(1) FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = :name
+                """
+            ),
+            {"name": name}
+        ).scalar() > 0
+
+
+def replace_limit_events(items, conn):
+    """
+    用新的事件替换 stock_limit_event 中对应 (date, code) 的全部事件
+
+    参数:
+    items: [(date, code, rows)]，rows 为 limit_events.event_rows 的结果
+    conn: 调用方的事务连接
+    """
+    if not items:
+        return 0
+    execute(
+        "DELETE FROM stock_limit_event WHERE date = :date AND code = :code",
+        [{"date": date, "code": code} for date, code, _ in items], conn=conn
+    )
+    rows = [{"date": date, "code": code, **row} for date, code, event_rows in items for row in event_rows]
+    if rows:
+        execute(
+            """
+            INSERT INTO stock_limit_event (date, code, seconds, type, price, volume)
+            VALUES (:date, :code, :seconds, :type, :price, :volume)
+            """,
+            rows, conn=conn
+        )
+    return len(rows)
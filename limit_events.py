@@ -0,0 +1,348 @@
+"""
+涨停事件识别
+
+基于分笔数据 (ak.stock_zh_a_tick_tx_js) 识别封板、炸板、回封事件。
+"""
+import json
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# 事件时间与 pd.to_datetime(成交时间, format='%H:%M:%S') 的结果一致，日期部分固定为 1900-01-01
+TIME_BASE = pd.Timestamp('1900-01-01')
+
+
+def time_to_seconds(times):
+    """
+    把 HH:MM:SS 格式的成交时间转换为日内秒数
+
+    参数:
+    times: 成交时间序列
+
+    返回:
+    np.ndarray: int32 日内秒数
+    """
+    values = np.asarray(times, dtype=str)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int32)
+    raw = values.astype('S8')
+    digits = raw.view(np.uint8).reshape(-1, 8).astype(np.int32) - ord('0')
+    if (np.char.str_len(values) == 8).all() and (digits[:, [2, 5]] == ord(':') - ord('0')).all():
+        return ((digits[:, 0] * 10 + digits[:, 1]) * 3600 +
+                (digits[:, 3] * 10 + digits[:, 4]) * 60 +
+                digits[:, 6] * 10 + digits[:, 7]).astype(np.int32)
+    # 非标准格式时回退到 pandas 解析
+    parsed = pd.to_datetime(pd.Series(values), format='%H:%M:%S')
+    return (parsed.dt.hour * 3600 + parsed.dt.minute * 60 + parsed.dt.second).to_numpy(dtype=np.int32)
+
+
+def seconds_to_time(seconds):
+    """日内秒数转换为事件时间 (1900-01-01 HH:MM:SS)"""
+    return TIME_BASE + pd.Timedelta(seconds=int(seconds))
+
+
+def tick_arrays(tick_df):
+    """
+    把分笔数据转换为检测用的数组，按位置访问，与 DataFrame 的索引无关
+
+    参数:
+    tick_df: 分笔数据DataFrame
+
+    返回:
+    tuple: (成交价格 float64, 成交量, 日内秒数 int32)
+    """
+    prices = tick_df['成交价格'].to_numpy(dtype=np.float64)
+    volumes = tick_df['成交量'].to_numpy()
+    seconds = time_to_seconds(tick_df['成交时间'])
+    return prices, volumes, seconds
+
+
+def _event(prices, volumes, seconds, i, event_type, with_volume=True):
+    """由位置构造事件字典，字段与写入 stock_model.events 的格式一致"""
+    event = {
+        '时间': seconds_to_time(seconds[i]),
+        '类型': event_type,
+        '价格': prices[i].item()
+    }
+    if with_volume:
+        event['成交量'] = volumes[i].item()
+    return event
+
+
+def _forward_count(mask, count):
+    """每个位置之后 count 笔 (不含自身) 中 mask 为真的笔数"""
+    n = len(mask)
+    cumulative = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    positions = np.arange(n)
+    return cumulative[np.minimum(positions + 1 + count, n)] - cumulative[positions + 1]
+
+
+def _state_machine_indices(at_limit, below_limit):
+    """
+    状态机检测，返回 [(位置, 类型)]
+
+    封板/回封候选需要后续3笔中至少2笔在涨停价，炸板候选需要后续2笔中至少1笔低于涨停价。
+    候选未被确认时原实现不会重置候选标记，之后不再产生任何事件，这里保持相同行为。
+    """
+    seal_confirmed = _forward_count(at_limit, 3) >= 2
+    break_confirmed = _forward_count(below_limit, 2) >= 1
+    at_positions = np.flatnonzero(at_limit)
+    below_positions = np.flatnonzero(below_limit)
+
+    found = []
+    state = "未封板"
+    start = 0
+    while True:
+        if state == "封板":
+            k = np.searchsorted(below_positions, start)
+            if k == len(below_positions):
+                break
+            i = below_positions[k]
+            if not break_confirmed[i]:
+                break
+            found.append((i, '炸板'))
+            state = "炸板"
+        else:
+            k = np.searchsorted(at_positions, start)
+            if k == len(at_positions):
+                break
+            i = at_positions[k]
+            if not seal_confirmed[i]:
+                break
+            found.append((i, '回封' if state == "炸板" else '封板'))
+            state = "封板"
+        start = i + 1
+    return found
+
+
+def identify_limit_events(tick_df, limit_price):
+    """
+    基于分笔数据识别涨停事件
+
+    参数:
+    tick_df: 分笔数据DataFrame
+    limit_price: 涨停价
+
+    返回:
+    list: 包含封板、炸板和回封事件的列表
+    """
+    prices, volumes, seconds = tick_arrays(tick_df)
+    found = _state_machine_indices(prices >= limit_price, prices < limit_price)
+    return [_event(prices, volumes, seconds, i, event_type) for i, event_type in found]
+
+
+def _window_counts(seconds, masks, window_seconds):
+    """
+    每笔成交在 [当前时间, 当前时间 + window_seconds] 时间窗口内的总笔数及各 mask 的笔数
+
+    窗口按时间而不是位置划分，同一秒内排在当前笔之前的成交也计入窗口。
+    在按时间排序后的数组上用 searchsorted 确定窗口边界，用累计和求窗口内笔数，整体为线性复杂度。
+
+    返回:
+    tuple: (总笔数, [各 mask 的笔数])
+    """
+    order = np.argsort(seconds, kind='stable')
+    sorted_seconds = seconds[order]
+    lo = np.searchsorted(sorted_seconds, seconds, side='left')
+    hi = np.searchsorted(sorted_seconds, seconds + window_seconds, side='right')
+    counts = []
+    for mask in masks:
+        cumulative = np.concatenate(([0], np.cumsum(mask[order], dtype=np.int64)))
+        counts.append(cumulative[hi] - cumulative[lo])
+    return hi - lo, counts
+
+
+def _alternate_indices(seal_starts, seal_ends, break_starts, break_ends):
+    """
+    在候选之间交替切换 封板 -> 炸板 -> 回封 ...，返回 [(位置, 类型)]
+
+    每个候选由 (起始位置, 触发位置) 描述: 起始位置不早于当前阶段开始的第一个候选在触发位置产生事件，
+    下一阶段从触发位置之后开始。封板状态下只看炸板候选，其余状态只看封板候选。
+    """
+    found = []
+    state = "未封板"
+    start = 0
+    while True:
+        starts, ends = (break_starts, break_ends) if state == "封板" else (seal_starts, seal_ends)
+        k = np.searchsorted(starts, start)
+        if k == len(starts):
+            break
+        i = ends[k]
+        if state == "封板":
+            found.append((i, '炸板'))
+            state = "炸板"
+        else:
+            found.append((i, '回封' if state == "炸板" else '封板'))
+            state = "封板"
+        start = i + 1
+    return found
+
+
+def _time_window_indices(at_limit, below_limit, seconds, time_window_seconds):
+    """时间窗口检测，返回 [(位置, 类型)]"""
+    total_trades, (limit_trades, below_limit_trades) = _window_counts(
+        seconds, [at_limit, below_limit], time_window_seconds
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        seal_ok = at_limit & (total_trades > 0) & (limit_trades / total_trades > 0.7)  # 70%以上在涨停价
+        break_ok = below_limit & (total_trades > 0) & (below_limit_trades / total_trades > 0.6)  # 60%以上低于涨停价
+    seal_positions = np.flatnonzero(seal_ok)
+    break_positions = np.flatnonzero(break_ok)
+    return _alternate_indices(seal_positions, seal_positions, break_positions, break_positions)
+
+
+def identify_with_time_window(tick_df, limit_price, time_window_seconds=30):
+    """
+    使用时间窗口确认涨停事件
+
+    参数:
+    tick_df: 分笔数据DataFrame
+    limit_price: 涨停价
+    time_window_seconds: 确认时间窗口(秒)
+
+    返回:
+    list: 事件列表
+    """
+    prices, volumes, seconds = tick_arrays(tick_df)
+    found = _time_window_indices(prices >= limit_price, prices < limit_price, seconds, time_window_seconds)
+    return [_event(prices, volumes, seconds, i, event_type, with_volume=False) for i, event_type in found]
+
+
+def _consecutive_pairs(relevant, qualified):
+    """
+    在 relevant 为真的成交中找相邻两笔都满足 qualified 的位置对
+
+    返回:
+    tuple: (第一笔位置, 第二笔位置)，均按位置升序
+    """
+    positions = np.flatnonzero(relevant)
+    ok = qualified[positions]
+    pair = ok[1:] & ok[:-1]
+    return positions[:-1][pair], positions[1:][pair]
+
+
+def _advanced_indices(at_limit, below_limit, volumes, avg_volume):
+    """
+    量价检测，返回 [(位置, 类型)]
+
+    非封板状态下只有涨停价成交会改变连续计数，封板状态下只有低于涨停价的成交会改变连续计数，
+    且每次状态切换时两个计数都为0，因此事件位置就是当前阶段内第一对相邻的放量成交中的第二笔。
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = volumes / avg_volume
+    seal_starts, seal_ends = _consecutive_pairs(at_limit, volume_ratio > 0.8)  # 成交量大于平均值的80%
+    break_starts, break_ends = _consecutive_pairs(below_limit, volume_ratio > 0.5)  # 成交量大于平均值的50%
+    return _alternate_indices(seal_starts, seal_ends, break_starts, break_ends)
+
+
+def advanced_limit_detection(tick_df, limit_price):
+    """
+    高级涨停事件检测，考虑成交量与价格变动
+    连续2笔放量涨停价成交视为封板，连续2笔放量低于涨停价成交视为炸板
+    """
+    prices, volumes, seconds = tick_arrays(tick_df)
+    # 计算平均成交量
+    avg_volume = tick_df['成交量'].mean()
+    found = _advanced_indices(prices >= limit_price, prices < limit_price, volumes, avg_volume)
+    return [_event(prices, volumes, seconds, i, event_type) for i, event_type in found]
+
+
+# 合并结果并进行投票
+def merge_events(df, limit_price, time_window_seconds=30):
+    """
+    三种检测方法共用一次数组转换和价格掩码，按日内秒数分组投票，至少两票一致的事件被采纳
+
+    参数:
+    df: 分笔数据DataFrame
+    limit_price: 涨停价
+    time_window_seconds: 时间窗口方法的确认窗口(秒)
+
+    返回:
+    list: 合并后的事件列表，与单独运行三种方法后投票的结果一致
+    """
+    prices, volumes, seconds = tick_arrays(df)
+    at_limit = prices >= limit_price
+    below_limit = prices < limit_price
+
+    # 方法1: 基于状态机的方法 / 方法2: 基于时间窗口的方法 / 方法3: 高级检测方法
+    # 时间窗口方法的事件不含成交量
+    detectors = [
+        (_state_machine_indices(at_limit, below_limit), True),
+        (_time_window_indices(at_limit, below_limit, seconds, time_window_seconds), False),
+        (_advanced_indices(at_limit, below_limit, volumes, df['成交量'].mean()), True),
+    ]
+
+    # 按日内秒数分组，组内按方法顺序、事件顺序保存 (类型, 位置, 是否含成交量)
+    time_groups = {}
+    for found, with_volume in detectors:
+        for i, event_type in found:
+            time_groups.setdefault(int(seconds[i]), []).append((event_type, i, with_volume))
+
+    # 对每个时间点进行投票，采纳第一个给出多数类型的方法的事件
+    merged_events = []
+    for candidates in time_groups.values():
+        most_common_type, count = Counter(event_type for event_type, _, _ in candidates).most_common(1)[0]
+        if count >= 2:
+            _, i, with_volume = next(c for c in candidates if c[0] == most_common_type)
+            merged_events.append(_event(prices, volumes, seconds, i, most_common_type, with_volume))
+
+    return merged_events
+
+
+# stock_model 中由事件派生的列
+EVENT_COLUMNS = ('first_seal_time', 'last_seal_time', 'first_break_time', 'last_break_time', 'break_count', 'events')
+
+
+def summarize_events(all_events):
+    """
+    由合并后的事件计算 stock_model 中的事件派生列
+
+    参数:
+    all_events: merge_events 返回的事件列表
+
+    返回:
+    dict: 首次/最后封板时间、首次/最后炸板时间 (%H:%M:%S 或 None)、炸板次数、事件 JSON
+    """
+    # 分析事件
+    seal_times = [event['时间'] for event in all_events if event['类型'] in ['封板', '回封']]
+    break_times = [event['时间'] for event in all_events if event['类型'] == '炸板']
+
+    def fmt(value):
+        return value.strftime('%H:%M:%S') if value is not None else None
+
+    events = [{**event, '时间': fmt(event['时间'])} for event in all_events]
+    return {
+        'first_seal_time': fmt(min(seal_times, default=None)),
+        'last_seal_time': fmt(max(seal_times, default=None)),
+        'first_break_time': fmt(min(break_times, default=None)),
+        'last_break_time': fmt(max(break_times, default=None)),
+        'break_count': len(break_times),
+        'events': json.dumps(events, ensure_ascii=False)
+    }
+
+
+# stock_limit_event.type 的取值
+EVENT_TYPE_CODES = {'封板': 1, '回封': 2, '炸板': 3}
+
+
+def event_rows(events_json):
+    """
+    把 summarize_events 生成的事件 JSON 转成 stock_limit_event 的行
+
+    参数:
+    events_json: summarize_events 返回的 events
+
+    返回:
+    list: 每个事件一个 dict: seconds (距0点秒数), type, price, volume (时间窗口法的事件没有成交量，为 None)
+    """
+    rows = []
+    for event in json.loads(events_json or '[]'):
+        hours, minutes, seconds = (int(part) for part in event['时间'].split(':'))
+        rows.append({
+            'seconds': hours * 3600 + minutes * 60 + seconds,
+            'type': EVENT_TYPE_CODES[event['类型']],
+            'price': event['价格'],
+            'volume': event.get('成交量')
+        })
+    return rows
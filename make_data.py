@@ -1,151 +1,192 @@
+import argparse
 import time
-import os
 import urllib.request
 import urllib.error
 
 import akshare as ak
 import pandas as pd
-from datetime import datetime, timedelta
-import pymysql
 import json as json
 import random
 
-from pandas.core.interchange.dataframe_protocol import DataFrame
+import bar_store
+import db
+import run_journal
+import tick_archive
+import trading_calendar
+from limit_events import event_rows, merge_events, summarize_events
 
 
-def make_stock_data(row, date):
+# 只处理沪深主板和创业板股票
+VALID_CODE_PREFIXES = ('60', '30', '00')
 
-    print(row)
+# 同一股票出现在多个来源时，按此顺序取第一个来源的字段:
+# 涨停池字段最全 (含连板数、涨停统计)，其次炸板股池，最后是库中昨日涨停的数据
+SOURCE_PRECEDENCE = ('zt', 'zbgc', 'previous')
 
-    name = safe_get_row_value(row, '名称') or safe_get_row_value(row, 'name')  # 名称
-    code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')  # 代码
 
-    print(f"开始处理: {date} {code} {name}")
-    # 通过 date 和 code 查询数据库是否有数据，有的话直接return
-    if check_data_exists(date, code):
-        print(f"数据已存在: {date} {code} {name}")
-        return
+def throttle():
+    # 东财接口请求过快会被限流，每次请求前随机等待
+    time.sleep(random.randrange(30, 60))
 
-    if not (code.startswith('60') or code.startswith('30') or code.startswith('00')):
-        return
 
-    if code.startswith('6'):
-        stock_type = 'sh'
-    else:
-        stock_type = 'sz'
+def get_stock_type(code):
+    return 'sh' if code.startswith('6') else 'sz'
 
 
-    # 获取股票信息 总股本，流通股本，行业
+def fetch_info(code):
+    """
+    获取股票信息 总股本，流通股本
+
+    返回:
+    dict: capitalization, circulating_cap
+    """
     print('--'*8+'获取股票信息 总股本，流通股本，行业')
-    random_range = random.randrange(30, 60)
-    time.sleep(random_range)
+    throttle()
     stock_individual_info_em_df = ak.stock_individual_info_em(symbol=code)
 
     df_indexed = stock_individual_info_em_df.set_index('item')
-    capitalization = df_indexed.loc['总股本', 'value']  # 总股本
-    circulating_cap = df_indexed.loc['流通股', 'value']  # 流通股本
+    return {
+        'capitalization': df_indexed.loc['总股本', 'value'],  # 总股本
+        'circulating_cap': df_indexed.loc['流通股', 'value']  # 流通股本
+    }
+
 
+def fetch_holders(code, circulating_cap):
+    """
+    根据10大流通股东计算真实流通股本 (去掉持股超过5%的股东)
+
+    返回:
+    dict: circulating_cap_real
+    """
     print('--'*8+'获取10大流通股东')
-    random_range = random.randrange(30, 60)
-    time.sleep(random_range)
+    throttle()
     try:
-        stock_gdfx_free_top_10_em_df = ak.stock_gdfx_free_top_10_em(symbol=stock_type + code, date="20250630")
+        stock_gdfx_free_top_10_em_df = ak.stock_gdfx_free_top_10_em(symbol=get_stock_type(code) + code, date="20250630")
         shareholding_numbers = stock_gdfx_free_top_10_em_df.query(
             '`占总流通股本持股比例` > 5.0'
         )['持股数'].tolist()
         circulating_cap_real = circulating_cap - sum(shareholding_numbers)  # 真实流通股本
     except Exception as e:
         circulating_cap_real = circulating_cap
+    return {'circulating_cap_real': circulating_cap_real}
 
 
+def fetch_quote(code):
+    """
+    获取实时盘口数据
 
+    返回:
+    dict: {item: value}
+    """
     print('--'*8+'获取实时数据')
-    random_range = random.randrange(30, 60)
-    time.sleep(random_range)
+    throttle()
     stock_bid_ask_em_df = ak.stock_bid_ask_em(symbol=code)
-    ask_index = stock_bid_ask_em_df.set_index('item')
-    volume = ask_index.loc['总手', 'value']  # 成交量 手
-    if volume == '-': #停牌
-        return
-    turnover_rate = ask_index.loc['换手', 'value']  # 换手率 %
-    turnover_rate_real = round((volume * 10000 / circulating_cap_real), 2)  # 真实换手率 %
-    buying_at_ask = ask_index.loc['外盘', 'value']  # 外盘
-    selling_at_bid = ask_index.loc['内盘', 'value']  # 内盘
-    buy_1_vol = ask_index.loc['buy_1_vol', 'value'] # 买一量
+    return dict(zip(stock_bid_ask_em_df['item'], stock_bid_ask_em_df['value']))
 
-    price = safe_get_row_value(row, '最新价') or ask_index.loc['最新', 'value'] # 最新价
-    limit_price =safe_get_row_value(row, '涨停价') or ask_index.loc['涨停', 'value'] # 涨停价
 
-    price_max = ask_index.loc['最高', 'value']
-    price_min = ask_index.loc['最低', 'value']
-    pre_price = ask_index.loc['昨收', 'value']
-    amplitude = round((price_max - price_min) / pre_price * 100, 2) # 振幅 %  （最高-最低）/ 昨收
+def fetch_hist(code, start_date, end_date):
+    """
+    从本地日线仓库读取整个日期范围的不复权日线，未覆盖的区间一次请求补齐
 
-    print('--' * 8 + '分笔数据')
+    参数:
+    code: 股票代码
+    start_date: 开始日期 (yyyy-mm-dd格式)
+    end_date: 结束日期 (yyyy-mm-dd格式)
 
-    stock_zh_a_tick_tx_js_df = ak.stock_zh_a_tick_tx_js(symbol=stock_type + code)
-    if stock_zh_a_tick_tx_js_df.empty:
-        print(f'没有数据{code},{name}')
-        # return
+    返回:
+    dict: {yyyy-mm-dd: 日线字段}
+    """
+    print('--'*8+f'获取日线数据 {start_date} -> {end_date}')
+    hist_df = bar_store.get_bars(code, start_date, end_date, sleep_range=(30, 60))
+    columns = ['开盘', '收盘', '最高', '最低', '成交量', '振幅', '涨跌额', '换手率']
+    return {r['日期']: {col: r[col] for col in columns} for r in hist_df.to_dict('records')}
 
-    df = stock_zh_a_tick_tx_js_df
 
-    # 竞价数据
-    first_tick = df.iloc[0]
-    first_volume = first_tick['成交量']  # 第一笔成交量
-    first_price = first_tick['成交价格']  # 第一笔成交价格
+def calc_limit_price(code, pre_close, name=None):
+    """
+    按昨收计算涨停价: 北交所30%，创业板/科创板20%，主板 ST 5%，其余主板10%
 
-    # 最后一笔 数据
-    last_tick = df.iloc[-1]
-    last_volume = last_tick['成交量']
-    last_price = last_tick['成交价格']
+    参数:
+    code: 股票代码，只取后6位
+    pre_close: 昨收价
+    name: 股票名称，用于识别主板 ST (创业板/科创板的 ST 仍为20%)
+    """
+    code = str(code)[-6:]
+    if code.startswith(('4', '8', '92')):
+        ratio = 1.3
+    elif code.startswith(('30', '68')):
+        ratio = 1.2
+    elif 'ST' in str(name or '').upper():
+        ratio = 1.05
+    else:
+        ratio = 1.1
+    return round(pre_close * ratio + 1e-6, 2)
 
 
-    # 将时间字符串转换为时间对象以便比较
-    df['时间对象'] = pd.to_datetime(df['成交时间'], format='%H:%M:%S')
+def build_record(row, date, info, circulating_cap_real, market, tick_df, limit_price):
+    """
+    组装一行 stock_model 数据，顺序与 STOCK_MODEL_COLUMNS 一致
 
-    # 合并所有方法的结果
-    print("检测涨停事件:")
-    all_events = merge_events(df, limit_price)
+    参数:
+    row: 股票池数据行
+    date: 日期 (yyyy-mm-dd格式)
+    info: fetch_info 的结果
+    circulating_cap_real: 真实流通股本
+    market: 当日行情 volume, turnover_rate, buying_at_ask, selling_at_bid, buy_1_vol,
+            price, open, close, amplitude
+    tick_df: 分笔数据，为 None 时首笔/最后一笔取开盘/收盘价，成交量记0，不检测事件
+    limit_price: 涨停价
 
+    返回:
+    tuple: 待保存的数据
+    """
+    name = safe_get_row_value(row, '名称') or safe_get_row_value(row, 'name')  # 名称
+    code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')  # 代码
+    capitalization = info['capitalization']
+    circulating_cap = info['circulating_cap']
 
+    volume = market['volume']
+    turnover_rate_real = round((volume * 10000 / circulating_cap_real), 2)  # 真实换手率 %
 
-    # 获取首次封板时间，最后封板时间，首次炸板时间，最后炸板时间，炸板次数
-    first_seal_time = None
-    last_seal_time = None
-    first_break_time = None
-    last_break_time = None
+    price = safe_get_row_value(row, '最新价') or market['price'] # 最新价
 
-    # 分析事件
-    seal_events = [event for event in all_events if event['类型'] in ['封板', '回封']]
-    break_events = [event for event in all_events if event['类型'] == '炸板']
+    if tick_df is not None:
+        # 竞价数据
+        first_tick = tick_df.iloc[0]
+        first_volume = first_tick['成交量']  # 第一笔成交量
+        first_price = first_tick['成交价格']  # 第一笔成交价格
 
-    # 获取首次和最后封板时间
-    if seal_events:
-        first_seal_time = min(seal_events, key=lambda x: x['时间'])['时间']
-        last_seal_time = max(seal_events, key=lambda x: x['时间'])['时间']
+        # 最后一笔 数据
+        last_tick = tick_df.iloc[-1]
+        last_volume = last_tick['成交量']
+        last_price = last_tick['成交价格']
 
-    # 获取首次和最后炸板时间
-    if break_events:
-        first_break_time = min(break_events, key=lambda x: x['时间'])['时间']
-        last_break_time = max(break_events, key=lambda x: x['时间'])['时间']
+        # 合并所有方法的结果
+        print("检测涨停事件:")
+        all_events = merge_events(tick_df, limit_price)
+    else:
+        first_volume, first_price = 0, market['open']
+        last_volume, last_price = 0, market['close']
+        all_events = []
 
-    # 计算炸板次数
-    break_count = len(break_events)
+    # 获取首次封板时间，最后封板时间，首次炸板时间，最后炸板时间，炸板次数
+    summary = summarize_events(all_events)
+    first_seal_time = summary['first_seal_time']
+    last_seal_time = summary['last_seal_time']
+    first_break_time = summary['first_break_time']
+    last_break_time = summary['last_break_time']
+    break_count = summary['break_count']
+    events = summary['events']
 
     dc_first_seal_time = safe_get_row_value(row, '首次封板时间')
     dc_last_seal_time = safe_get_row_value(row, '最后封板时间')
     dc_break_count = safe_get_row_value(row, '炸板次数') or 0
     limit_up_statistics =  safe_get_row_value(row, '涨停统计') or increment_first_number(safe_get_row_value(row, 'limit_up_statistics'))
     limit_up_days = safe_get_row_value(row, '连板数')
-    amplitude = safe_get_row_value(row, '振幅') or amplitude
+    amplitude = safe_get_row_value(row, '振幅') or market['amplitude']
     industry = safe_get_row_value(row, '所属行业') or safe_get_row_value(row, 'industry')
-    for event in all_events:
-        if '时间' in event and hasattr(event['时间'], 'strftime'):
-            event['时间'] = event['时间'].strftime('%H:%M:%S')
-    events = json.dumps(all_events, ensure_ascii=False)
 
-    data_to_save = (
+    return (
         date, # 当前日期 yyyy-MM-dd
         name, # 名称
         code, # 代码
@@ -154,10 +195,10 @@ def make_stock_data(row, date):
         circulating_cap_real, # 真实流通股本 float
         price, # 最新价 float
         volume, # 成交量 手 int
-        turnover_rate, # 换手率 % float
+        market['turnover_rate'], # 换手率 % float
         turnover_rate_real, # 真实换手率 % float
-        buying_at_ask, # 外盘 float
-        selling_at_bid, # 内盘 float
+        market['buying_at_ask'], # 外盘 float
+        market['selling_at_bid'], # 内盘 float
         first_volume, # 首笔成交量 手 int
         first_price, # 首笔成交价格 float
         last_volume, # 最后一笔成交量 手 int
@@ -174,14 +215,79 @@ def make_stock_data(row, date):
         limit_up_statistics, # 涨停统计 str
         amplitude, # 振幅  float
         industry, # 所属行业 str
-        buy_1_vol, # 买一量
+        market['buy_1_vol'], # 买一量
         limit_up_days # 连板数 int
-
     )
 
+
+def make_stock_data(row, date):
+
+    print(row)
+
+    name = safe_get_row_value(row, '名称') or safe_get_row_value(row, 'name')  # 名称
+    code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')  # 代码
+
+    print(f"开始处理: {date} {code} {name}")
+    # 运行日志中已完成保存的股票直接跳过
+    if run_journal.get_stage(date, code, 'save')[0]:
+        print(f"运行日志显示已完成: {date} {code} {name}")
+        return
+
+    # 库中是否已有数据由 plan_work_set 之后的 get_existing_codes 统一批量检查
+    if not code.startswith(VALID_CODE_PREFIXES):
+        return
+
+    # 获取股票信息 总股本，流通股本，行业
+    info = run_journal.run_stage(date, code, 'info', lambda: fetch_info(code))
+    circulating_cap_real = run_journal.run_stage(
+        date, code, 'holders', lambda: fetch_holders(code, info['circulating_cap'])
+    )['circulating_cap_real']
+
+    ask_index = run_journal.run_stage(date, code, 'quote', lambda: fetch_quote(code))
+    volume = ask_index['总手']  # 成交量 手
+    if volume == '-': #停牌
+        run_journal.finish_stage(date, code, 'save', {'skipped': '停牌'})
+        return
+
+    limit_price =safe_get_row_value(row, '涨停价') or ask_index['涨停'] # 涨停价
+
+    price_max = ask_index['最高']
+    price_min = ask_index['最低']
+    pre_price = ask_index['昨收']
+    market = {
+        'volume': volume,
+        'turnover_rate': ask_index['换手'],  # 换手率 %
+        'buying_at_ask': ask_index['外盘'],  # 外盘
+        'selling_at_bid': ask_index['内盘'],  # 内盘
+        'buy_1_vol': ask_index['buy_1_vol'], # 买一量
+        'price': ask_index['最新'],
+        'amplitude': round((price_max - price_min) / pre_price * 100, 2) # 振幅 %  （最高-最低）/ 昨收
+    }
+
+    print('--' * 8 + '分笔数据')
+
+    # 优先读取本地归档，没有时再请求接口并归档
+    stock_zh_a_tick_tx_js_df = tick_archive.load_ticks(date, code)
+    if stock_zh_a_tick_tx_js_df is None:
+        stock_zh_a_tick_tx_js_df = ak.stock_zh_a_tick_tx_js(symbol=get_stock_type(code) + code)
+        if not stock_zh_a_tick_tx_js_df.empty:
+            try:
+                tick_archive.save_ticks(date, code, stock_zh_a_tick_tx_js_df, limit_price)
+            except Exception as e:
+                print(f"分笔数据归档失败: {e}")
+    else:
+        print(f"读取归档分笔数据: {date} {code}")
+    if stock_zh_a_tick_tx_js_df.empty:
+        print(f'没有数据{code},{name}')
+        # return
+
+    data_to_save = build_record(row, date, info, circulating_cap_real, market, stock_zh_a_tick_tx_js_df, limit_price)
+
     # 保存数据到数据库
     print("保存数据到数据库")
-    save_date(data_to_save)
+    if not save_date(data_to_save):
+        raise RuntimeError(f"数据保存失败: {date} {code}")
+    run_journal.finish_stage(date, code, 'save')
 
 
 def increment_first_number(pattern_str):
@@ -208,377 +314,40 @@ def safe_get_row_value(row, column_name, default_value=None):
     except KeyError:
         return default_value
 
-def identify_limit_events(tick_df, limit_price):
-    """
-    基于分笔数据识别涨停事件
 
-    参数:
-    tick_df: 分笔数据DataFrame
-    limit_price: 涨停价
+# stock_model 插入列，顺序与 make_stock_data 中的 data_to_save 一致
+STOCK_MODEL_COLUMNS = (
+    'date', 'name', 'code', 'market_capitalization', 'circulating_market_capitalization',
+    'real_circulating_capitalization', 'price', 'volume', 'turnover_rate', 'real_turnover_rate',
+    'outside_volume', 'inside_volume', 'first_volume', 'first_price', 'last_volume', 'last_price',
+    'first_seal_time', 'last_seal_time', 'first_break_time', 'last_break_time', 'break_count',
+    'events', 'dc_first_seal_time', 'dc_last_seal_time', 'dc_break_count', 'limit_up_statistics',
+    'amplitude', 'industry', 'buy_1_vol', 'limit_up_days'
+)
 
-    返回:
-    dict: 包含封板、炸板和回封事件的字典
-    """
-    # 初始化状态变量
-    state = "未封板"  # 可能状态: "未封板", "封板", "炸板"
-    events = []
-    current_seal_start = None
-    current_break_start = None
-
-    # 存储临时状态
-    seal_candidate = False
-    seal_candidate_time = None
-    break_candidate = False
-    break_candidate_time = None
-
-    # 遍历每一笔成交
-    for i, row in tick_df.iterrows():
-        current_time = row['时间对象']
-        current_price = row['成交价格']
-        volume = row['成交量']
-
-        # 状态: 未封板
-        if state == "未封板":
-            if current_price >= limit_price:
-                # 首次达到涨停价，标记为封板候选
-                if not seal_candidate:
-                    seal_candidate = True
-                    seal_candidate_time = current_time
-                    # 检查后续几笔确认
-                    confirm_count = 0
-                    for j in range(i + 1, min(i + 4, len(tick_df))):  # 查看后续3笔
-                        if tick_df.iloc[j]['成交价格'] >= limit_price:
-                            confirm_count += 1
-
-                    if confirm_count >= 2:  # 后续至少有2笔确认
-                        state = "封板"
-                        current_seal_start = seal_candidate_time
-                        events.append({
-                            '时间': seal_candidate_time,
-                            '类型': '封板',
-                            '价格': current_price,
-                            '成交量': volume
-                        })
-                        seal_candidate = False
-
-        # 状态: 封板
-        elif state == "封板":
-            if current_price < limit_price:
-                # 价格跌破涨停价，标记为炸板候选
-                if not break_candidate:
-                    break_candidate = True
-                    break_candidate_time = current_time
-                    # 检查后续几笔确认
-                    confirm_count = 0
-                    for j in range(i + 1, min(i + 3, len(tick_df))):  # 查看后续2笔
-                        if tick_df.iloc[j]['成交价格'] < limit_price:
-                            confirm_count += 1
-
-                    if confirm_count >= 1:  # 后续至少有1笔确认
-                        state = "炸板"
-                        events.append({
-                            '时间': break_candidate_time,
-                            '类型': '炸板',
-                            '价格': current_price,
-                            '成交量': volume
-                        })
-                        break_candidate = False
-                        current_break_start = break_candidate_time
-
-        # 状态: 炸板
-        elif state == "炸板":
-            if current_price >= limit_price:
-                # 价格再次达到涨停价，标记为回封候选
-                if not seal_candidate:
-                    seal_candidate = True
-                    seal_candidate_time = current_time
-                    # 检查后续几笔确认
-                    confirm_count = 0
-                    for j in range(i + 1, min(i + 4, len(tick_df))):  # 查看后续3笔
-                        if tick_df.iloc[j]['成交价格'] >= limit_price:
-                            confirm_count += 1
-
-                    if confirm_count >= 2:  # 后续至少有2笔确认
-                        state = "封板"
-                        events.append({
-                            '时间': seal_candidate_time,
-                            '类型': '回封',
-                            '价格': current_price,
-                            '成交量': volume
-                        })
-                        seal_candidate = False
-                        current_seal_start = seal_candidate_time
-
-    return events
-
-
-def identify_with_time_window(tick_df, limit_price, time_window_seconds=30):
-    """
-    使用时间窗口确认涨停事件
-
-    参数:
-    tick_df: 分笔数据DataFrame
-    limit_price: 涨停价
-    time_window_seconds: 确认时间窗口(秒)
-
-    返回:
-    list: 事件列表
-    """
-    events = []
-    state = "未封板"
-    last_event_time = None
-
-    for i, row in tick_df.iterrows():
-        current_time = row['时间对象']
-        current_price = row['成交价格']
-
-        # 封板检测
-        if state in ["未封板", "炸板"] and current_price >= limit_price:
-            # 查找时间窗口内的后续交易
-            window_end = current_time + timedelta(seconds=time_window_seconds)
-            window_data = tick_df[(tick_df['时间对象'] >= current_time) &
-                                  (tick_df['时间对象'] <= window_end)]
-
-            # 计算窗口中涨停价交易的比例
-            limit_trades = len(window_data[window_data['成交价格'] >= limit_price])
-            total_trades = len(window_data)
-
-            if total_trades > 0 and limit_trades / total_trades > 0.7:  # 70%以上在涨停价
-                event_type = "回封" if state == "炸板" else "封板"
-                events.append({
-                    '时间': current_time,
-                    '类型': event_type,
-                    '价格': current_price
-                })
-                state = "封板"
-                last_event_time = current_time
-
-        # 炸板检测
-        elif state == "封板" and current_price < limit_price:
-            # 查找时间窗口内的后续交易
-            window_end = current_time + timedelta(seconds=time_window_seconds)
-            window_data = tick_df[(tick_df['时间对象'] >= current_time) &
-                                  (tick_df['时间对象'] <= window_end)]
-
-            # 计算窗口中低于涨停价交易的比例
-            below_limit_trades = len(window_data[window_data['成交价格'] < limit_price])
-            total_trades = len(window_data)
-
-            if total_trades > 0 and below_limit_trades / total_trades > 0.6:  # 60%以上低于涨停价
-                events.append({
-                    '时间': current_time,
-                    '类型': '炸板',
-                    '价格': current_price
-                })
-                state = "炸板"
-                last_event_time = current_time
-
-    return events
-
-
-def advanced_limit_detection(tick_df, limit_price):
-    """
-    高级涨停事件检测，考虑成交量与价格变动
-    """
-    events = []
-    state = "未封板"
-    seal_streak = 0  # 连续涨停计数
-    break_streak = 0  # 连续非涨停计数
-
-    # 计算平均成交量
-    avg_volume = tick_df['成交量'].mean()
-
-    for i, row in tick_df.iterrows():
-        current_time = row['时间对象']
-        current_price = row['成交价格']
-        current_volume = row['成交量']
-        price_change = row['价格变动']
-
-        # 封板检测
-        if state != "封板" and current_price >= limit_price:
-            # 大成交量涨停更可能是真封板
-            volume_ratio = current_volume / avg_volume
-            if volume_ratio > 0.8:  # 成交量大于平均值的80%
-                seal_streak += 1
-                break_streak = 0
-
-                if seal_streak >= 2:  # 连续2笔涨停价成交
-                    event_type = "回封" if state == "炸板" else "封板"
-                    events.append({
-                        '时间': current_time,
-                        '类型': event_type,
-                        '价格': current_price,
-                        '成交量': current_volume
-                    })
-                    state = "封板"
-                    seal_streak = 0
-            else:
-                seal_streak = 0
-
-        # 炸板检测
-        elif state == "封板" and current_price < limit_price:
-            # 大成交量下跌更可能是真炸板
-            volume_ratio = current_volume / avg_volume
-            if volume_ratio > 0.5:  # 成交量大于平均值的50%
-                break_streak += 1
-                seal_streak = 0
-
-                if break_streak >= 2:  # 连续2笔非涨停价成交
-                    events.append({
-                        '时间': current_time,
-                        '类型': '炸板',
-                        '价格': current_price,
-                        '成交量': current_volume
-                    })
-                    state = "炸板"
-                    break_streak = 0
-            else:
-                break_streak = 0
-
-    return events
-
-
-# 合并结果并进行投票
-def merge_events(df, limit_price):
-    # 方法1: 基于状态机的方法
-    events1 = identify_limit_events(df, limit_price)
-
-    # 方法2: 基于时间窗口的方法
-    events2 = identify_with_time_window(df, limit_price, time_window_seconds=30)
-
-    # 方法3: 高级检测方法
-    events3 = advanced_limit_detection(df, limit_price)
-
-    events_list = [events1, events2, events3]
-
-    """合并多个方法的结果"""
-    from collections import defaultdict
-
-    # 按时间分组事件
-    time_groups = defaultdict(list)
-    for events in events_list:
-        for event in events:
-            time_key = event['时间'].strftime('%H:%M:%S')
-            time_groups[time_key].append(event['类型'])
-
-    # 对每个时间点进行投票
-    merged_events = []
-    for time_key, types in time_groups.items():
-        # 计算每种类型的票数
-        from collections import Counter
-        type_counts = Counter(types)
-        most_common_type, count = type_counts.most_common(1)[0]
-
-        # 如果至少有两种方法同意，则采纳
-        if count >= 2:
-            # 找到原始事件获取详细信息
-            for events in events_list:
-                for event in events:
-                    if event['时间'].strftime('%H:%M:%S') == time_key and event['类型'] == most_common_type:
-                        merged_events.append(event)
-                        break
-                if any(event['时间'].strftime('%H:%M:%S') == time_key for event in merged_events):
-                    break
-
-    return merged_events
-
-
-def check_data_exists(date, code):
-    """
-    检查指定日期和代码的数据是否已存在于数据库中
-
-    参数:
-    date: 日期 (yyyy-mm-dd格式)
-    code: 股票代码
-
-    返回:
-    bool: 如果数据存在返回True，否则返回False
-    """
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-    try:
-
-        with connection.cursor() as cursor:
-            # 查询是否存在相同日期和代码的数据
-            query = """
-                SELECT COUNT(*) as count 
-                FROM stock_model 
-                WHERE date = %s AND code = %s
-            """
-            cursor.execute(query, (date, code))
-            result = cursor.fetchone()
-
-            # 如果计数大于0，说明数据已存在
-            return result['count'] > 0
-
-    except Exception as e:
-        print(f"检查数据是否存在时出错: {e}")
-        return False  # 出错时默认返回False，继续处理数据
-
-    finally:
-        if connection:
-            connection.close()
 
 def save_date(data):
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    # 准备插入语句
+    # 依赖唯一键 uk_code_date (migrate.py 版本1)，重复运行时覆盖为完整数据
+    insert_query = f"""
+    INSERT INTO stock_model (
+        {', '.join(STOCK_MODEL_COLUMNS)}
+    ) VALUES ({', '.join(':' + col for col in STOCK_MODEL_COLUMNS)})
+    ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col in STOCK_MODEL_COLUMNS if col not in ('date', 'code'))}
+    """
 
     try:
-        with connection.cursor() as cursor:
-            # 准备插入语句
-            # Python中使用参数化查询的示例
-            insert_query = """
-            INSERT INTO stock_model (
-                date, name, code, market_capitalization, circulating_market_capitalization,
-                real_circulating_capitalization, price, volume, turnover_rate, real_turnover_rate,
-                outside_volume, inside_volume, first_volume, first_price, last_volume, last_price,
-                first_seal_time, last_seal_time, first_break_time, last_break_time, break_count,
-                events, dc_first_seal_time, dc_last_seal_time, dc_break_count, limit_up_statistics,
-                amplitude, industry, buy_1_vol, limit_up_days
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-
-            # 执行插入操作
-            cursor.execute(insert_query, data)
-
-        connection.commit()
+        # 执行插入操作，异常时事务自动回滚
+        record = dict(zip(STOCK_MODEL_COLUMNS, data))
+        with db.transaction() as conn:
+            db.execute(insert_query, record, conn=conn)
+            # 事件同时拆分写入 stock_limit_event
+            db.replace_limit_events([(record['date'], record['code'], event_rows(record['events']))], conn=conn)
+            db.bump_data_version(conn=conn)
+        return True
     except Exception as e:
-        # 发生错误时回滚
-        connection.rollback()
         print(f"数据保存失败: {e}")
-
-    finally:
-        # 关闭数据库连接
-        connection.close()
+        return False
 
 
 def dingtalk_get_access_token(app_key=None, app_secret=None):
@@ -641,62 +410,305 @@ def get_previous_limit_up_stocks(date):
     返回:
     list: 符合条件的股票数据列表
     """
+    try:
+        # 查询昨日涨停的股票数据
+        query = """
+            SELECT * 
+            FROM stock_model 
+            WHERE limit_up_days IS NOT NULL 
+            AND date = :date
+        """
+        return db.fetch_all(query, {"date": date})
 
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
+    except Exception as e:
+        print(f"查询昨日涨停股票时出错: {e}")
+        return []
 
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
 
+def get_existing_codes(date):
+    """
+    一次查询获取指定日期库中已存在的股票代码
+
+    参数:
+    date: 日期 (yyyy-mm-dd格式)
+
+    返回:
+    set: 股票代码集合
+    """
     try:
-        with connection.cursor() as cursor:
-            # 查询昨日涨停的股票数据
-            query = """
-                SELECT * 
-                FROM stock_model 
-                WHERE limit_up_days IS NOT NULL 
-                AND date = %s
-            """
-            cursor.execute(query, (date,))
-            result = cursor.fetchall()
-            return result
+        rows = db.fetch_all("SELECT DISTINCT code FROM stock_model WHERE date = :date", {"date": date})
+        return {row['code'] for row in rows}
+    except Exception as e:
+        print(f"查询已存在数据时出错: {e}")
+        return set()  # 出错时视为不存在，继续处理数据
+
 
+def plan_work_set(sources):
+    """
+    把多个股票池合并为按代码去重的工作集
+
+    参数:
+    sources: {来源: DataFrame}，来源为 SOURCE_PRECEDENCE 中的名称
+
+    返回:
+    dict: {code: (来源, row)}，按来源优先级和原始顺序排列，每只股票只出现一次
+    """
+    work_set = {}
+    for source in SOURCE_PRECEDENCE:
+        df = sources.get(source)
+        if df is None or df.empty:
+            continue
+        for _, row in df.iterrows():
+            code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')
+            if not code or not str(code).startswith(VALID_CODE_PREFIXES):
+                continue
+            work_set.setdefault(str(code), (source, row))
+    return work_set
+
+
+def process_row(row, date, failed):
+    """
+    处理单只股票，失败时记入重试列表而不中断整个运行
+
+    参数:
+    row: 股票数据行
+    date: 日期 (yyyy-mm-dd格式)
+    failed: {code: row}，收集本次运行失败的股票
+    """
+    code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')
+    try:
+        make_stock_data(row, date)
+        run_journal.clear_retry(date, code)
+        failed.pop(code, None)
     except Exception as e:
-        print(f"查询昨日涨停股票时出错: {e}")
-        return []
+        print(f"处理失败: {date} {code} {e}")
+        run_journal.add_retry(date, code, e)
+        failed[code] = row
+
 
-    finally:
-        if connection:
-            connection.close()
+def as_previous_rows(zt_df):
+    """
+    把前一交易日的涨停池转换成库中昨日涨停数据的字段，回填时前一日数据可能尚未入库
+
+    返回:
+    DataFrame: code, name, industry, limit_up_statistics
+    """
+    if zt_df is None or zt_df.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        'code': zt_df['代码'],
+        'name': zt_df['名称'],
+        'industry': zt_df['所属行业'],
+        'limit_up_statistics': zt_df['涨停统计'],
+    })
+
+
+def plan_backfill(start_date, end_date):
+    """
+    预先规划日期范围内全部 (date, code) 工作
+
+    参数:
+    start_date: 开始日期 (yyyy-mm-dd格式)
+    end_date: 结束日期 (yyyy-mm-dd格式)
+
+    返回:
+    dict: {code: [(date, row)]}，已入库的 (date, code) 不再出现
+    """
+    dates = [d.strftime('%Y-%m-%d') for d in trading_calendar.trading_days_between(start_date, end_date)]
+    if not dates:
+        return {}
+    existing = set()
+    try:
+        rows = db.fetch_all(
+            "SELECT DISTINCT date, code FROM stock_model WHERE date BETWEEN :start AND :end",
+            {"start": dates[0], "end": dates[-1]}
+        )
+        existing = {(pd.Timestamp(row['date']).strftime('%Y-%m-%d'), row['code']) for row in rows}
+    except Exception as e:
+        print(f"查询已存在数据时出错: {e}")
+
+    plan = {}
+    pre_date = trading_calendar.prev_trading_day(dates[0]).strftime('%Y-%m-%d')
+    previous = pd.DataFrame(get_previous_limit_up_stocks(pre_date))
+    for date in dates:
+        raw_date = date.replace('-', '')
+        zt_df = ak.stock_zt_pool_em(date=raw_date)
+        sources = {
+            'zt': zt_df,
+            'zbgc': ak.stock_zt_pool_zbgc_em(date=raw_date),
+            'previous': previous,
+        }
+        work_set = plan_work_set(sources)
+        pending = 0
+        for code, (source, row) in work_set.items():
+            if (date, code) not in existing:
+                plan.setdefault(code, []).append((date, row))
+                pending += 1
+        print(f"{date} 工作集 {len(work_set)} 只，待处理 {pending} 只")
+        previous = as_previous_rows(zt_df)
+    return plan
+
+
+def make_backfill_data(row, date, info, circulating_cap_real, bars, limit_prices):
+    """
+    用整段日线数据生成单日记录，不再请求接口
+
+    参数:
+    row: 股票池数据行
+    date: 日期 (yyyy-mm-dd格式)
+    info: fetch_info 的结果
+    circulating_cap_real: 真实流通股本
+    bars: fetch_hist 的结果
+    limit_prices: 分笔归档 manifest 中的涨停价 {(date, code): 涨停价}
+    """
+    code = safe_get_row_value(row, '代码') or safe_get_row_value(row, 'code')
+    if run_journal.get_stage(date, code, 'save')[0]:
+        print(f"运行日志显示已完成: {date} {code}")
+        return
+
+    bar = bars.get(date)
+    if bar is None: #停牌
+        run_journal.finish_stage(date, code, 'save', {'skipped': '停牌'})
+        return
+
+    limit_price = (safe_get_row_value(row, '涨停价') or limit_prices.get((date, code))
+                   or calc_limit_price(code, bar['收盘'] - bar['涨跌额'],
+                                       safe_get_row_value(row, '名称') or safe_get_row_value(row, 'name')))
+    # 历史日期没有盘口数据: 外盘/内盘记0，买一量为空
+    market = {
+        'volume': bar['成交量'],
+        'turnover_rate': bar['换手率'],
+        'buying_at_ask': 0,
+        'selling_at_bid': 0,
+        'buy_1_vol': None,
+        'price': bar['收盘'],
+        'open': bar['开盘'],
+        'close': bar['收盘'],
+        'amplitude': bar['振幅']
+    }
+    # 分笔接口只能取当日数据，历史日期只使用本地归档
+    tick_df = tick_archive.load_ticks(date, code)
+    if tick_df is not None and tick_df.empty:
+        tick_df = None
+
+    data_to_save = build_record(row, date, info, circulating_cap_real, market, tick_df, limit_price)
+    if not save_date(data_to_save):
+        raise RuntimeError(f"数据保存失败: {date} {code}")
+    run_journal.finish_stage(date, code, 'save')
+
+
+def backfill(start_date, end_date):
+    """
+    回填日期范围内的数据，每只股票的基本信息、流通股东和日线只请求一次，由各日期共用
+
+    参数:
+    start_date: 开始日期 (yyyy-mm-dd格式)
+    end_date: 结束日期 (yyyy-mm-dd格式)
+
+    返回:
+    dict: 失败的 {(date, code): 错误信息}
+    """
+    plan = plan_backfill(start_date, end_date)
+    total = sum(len(items) for items in plan.values())
+    print(f"回填 {start_date} -> {end_date}: {len(plan)} 只股票，{total} 条待处理")
+    # 基本信息和流通股东按日期范围记入运行日志，日线由本地仓库缓存，中断后重新运行不会重复请求
+    span = f"{start_date}~{end_date}"
+    limit_prices = {
+        (r.date, r.code): r.limit_price
+        for r in tick_archive.read_manifest(start_date, end_date).itertuples(index=False)
+        if pd.notna(r.limit_price)
+    }
+    failed = {}
+    for code, items in plan.items():
+        pending = [(date, row) for date, row in items if not run_journal.get_stage(date, code, 'save')[0]]
+        if not pending:
+            continue
+        try:
+            info = run_journal.run_stage(span, code, 'info', lambda: fetch_info(code))
+            circulating_cap_real = run_journal.run_stage(
+                span, code, 'holders', lambda: fetch_holders(code, info['circulating_cap'])
+            )['circulating_cap_real']
+            bars = fetch_hist(code, start_date, end_date)
+        except Exception as e:
+            print(f"获取共用数据失败: {code} {e}")
+            for date, row in pending:
+                run_journal.add_retry(date, code, e)
+                failed[(date, code)] = str(e)
+            continue
+        for date, row in pending:
+            print(f"开始处理: {date} {code}")
+            try:
+                make_backfill_data(row, date, info, circulating_cap_real, bars, limit_prices)
+                run_journal.clear_retry(date, code)
+            except Exception as e:
+                print(f"处理失败: {date} {code} {e}")
+                run_journal.add_retry(date, code, e)
+                failed[(date, code)] = str(e)
+    return failed
+
+
+def to_iso_date(raw_date):
+    """yyyymmdd -> yyyy-mm-dd"""
+    return f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:]}"
+
+
+def run_daily(raw_date, pre_date=None):
+    target_date = to_iso_date(raw_date)
+    # 前一交易日默认按交易日历推算
+    pre_date = pre_date or trading_calendar.prev_trading_day(target_date).strftime('%Y-%m-%d')
+    failed = {}
+    sources = {
+        'zt': ak.stock_zt_pool_em(date=raw_date),
+        'zbgc': ak.stock_zt_pool_zbgc_em(date=raw_date),
+        'previous': pd.DataFrame(get_previous_limit_up_stocks(pre_date)),
+    }
+    for source, df in sources.items():
+        print(source, df.shape)
+    work_set = plan_work_set(sources)
+    existing = get_existing_codes(target_date)
+    pending = [(code, row) for code, (source, row) in work_set.items() if code not in existing]
+    print(f"工作集 {len(work_set)} 只，已存在 {len(work_set) - len(pending)} 只，待处理 {len(pending)} 只")
+    # 上次运行失败的股票排在最前面重新处理，已入库的从重试列表移除
+    retries = {}
+    for code, attempts, _ in run_journal.list_retries(target_date):
+        if code in existing:
+            run_journal.clear_retry(target_date, code)
+        elif code not in work_set:
+            print(f"重试列表中的 {code} 不在本次工作集中，跳过")
+        else:
+            retries[code] = attempts
+    if retries:
+        print(f"重试列表 {len(retries)} 只: {','.join(f'{code}({attempts}次)' for code, attempts in retries.items())}")
+    pending.sort(key=lambda item: item[0] not in retries)
+    for code, row in pending:
+        process_row(row, target_date, failed)
+    # 对本次失败的股票重试一次，已完成的阶段不会重复请求
+    for code, row in list(failed.items()):
+        print(f"重试: {target_date} {code}")
+        process_row(row, target_date, failed)
+    return failed
 
 
 if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="采集涨停股票数据")
+    p.add_argument("--date", default='20251203', help="采集日期 yyyymmdd")
+    p.add_argument("--pre-date", help="前一交易日 yyyy-mm-dd，默认按交易日历推算")
+    p.add_argument("--start", help="回填开始日期 yyyymmdd，与 --end 一起使用时进入回填模式")
+    p.add_argument("--end", help="回填结束日期 yyyymmdd")
+    args = p.parse_args()
+    # save_date 同一事务内写入 stock_limit_event，表不存在时每一行都会保存失败
+    if not db.table_exists("stock_limit_event"):
+        raise SystemExit("stock_limit_event 表不存在，请先运行 python migrate.py")
     try:
-        raw_date = '20251203'
-        target_date = f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:]}"
-        stock_zt_pool_zbgc_em_df = ak.stock_zt_pool_zbgc_em(date=raw_date)
-        print(stock_zt_pool_zbgc_em_df.shape)
-        stock_zt_pool_zbgc_em_df.apply(lambda row: make_stock_data(row, target_date), axis=1)
-        stock_zt_pool_em_df = ak.stock_zt_pool_em(date=raw_date)
-        print(stock_zt_pool_em_df.shape)
-        stock_zt_pool_em_df.apply(lambda row: make_stock_data(row, target_date), axis=1)
-        pre_date = "2025-12-02"
-        previous_limit_up_stocks = get_previous_limit_up_stocks(pre_date)
-        previous_limit_up_df = pd.DataFrame(previous_limit_up_stocks)
-        print(previous_limit_up_df.shape)
-        previous_limit_up_df.apply(lambda row: make_stock_data(row, target_date), axis=1)
-        notify("完成")
+        if args.start and args.end:
+            failed = backfill(to_iso_date(args.start), to_iso_date(args.end))
+            failed_codes = [f"{date} {code}" for date, code in failed]
+        else:
+            failed_codes = list(run_daily(args.date, args.pre_date))
+        if failed_codes:
+            notify(f"完成，{len(failed_codes)} 只失败待重试: {','.join(failed_codes)}")
+        else:
+            notify("完成")
     except Exception as e:
         print(f"运行异常: {e}")
         notify("失败")
@@ -0,0 +1,292 @@
+"""
+涨停板市场指标计算
+
+梯队数量、晋级率、溢价率、情绪值等纯计算函数，只依赖 pandas/numpy，
+看板 (stock_dashboard_v2.py) 和指标接口 (metrics_api.py) 共用。
+输入均为 dashboard_data.load_stock_data 返回的数据。
+"""
+import numpy as np
+import pandas as pd
+
+
+def filter_data_by_date_range(df, date_range):
+    """根据日期范围筛选数据"""
+    if len(date_range) == 2:
+        start_date = pd.to_datetime(date_range[0]).date()
+        end_date = pd.to_datetime(date_range[1]).date()
+        return df[(df['date'] >= start_date) & (df['date'] <= end_date)].copy()
+    return df.copy()
+
+
+def calculate_premium_rates(df):
+    """
+    计算涨停股票第二天的溢价率
+
+    按代码和日期排序后整体错位一行得到同一只股票的下一个交易日 (不要求严格连续1天)，
+    不逐行遍历
+    """
+    # 按股票代码和日期排序
+    df_sorted = df.sort_values(['code', 'date']).reset_index(drop=True)
+    next_rows = df_sorted.shift(-1)
+    
+    # 确保是同一只股票且是下一个交易日，且当天是涨停股票
+    mask = (
+        (df_sorted['code'] == next_rows['code']) &
+        (pd.to_datetime(next_rows['date']) > pd.to_datetime(df_sorted['date'])) &
+        df_sorted['limit_up_days'].notna()
+    )
+    current = df_sorted[mask]
+    following = next_rows[mask]
+    
+    limit_up_price = current['price']
+    # 第二天开盘价溢价率 = (次日开盘价 - 涨停价) / 涨停价 * 100%
+    next_day_open_price = following['first_price']
+    # 第二天收盘价较前一天涨停价溢价率
+    next_day_close_price = following['last_price']
+    
+    return pd.DataFrame({
+        'date': pd.to_datetime(current['date']).dt.date,
+        'code': current['code'],
+        'name': current['name'],
+        'limit_up_price': limit_up_price,
+        'limit_up_statistics': current['limit_up_statistics'].fillna(''),
+        'next_day_open_price': next_day_open_price,
+        'next_day_close_price': next_day_close_price,
+        'opening_premium_rate': ((next_day_open_price - limit_up_price) / limit_up_price) * 100,
+        'closing_premium_rate': ((next_day_close_price - limit_up_price) / limit_up_price) * 100,
+        'limit_up_days': current['limit_up_days'],
+        'industry': current['industry'],
+        'amplitude': current['amplitude']
+    }).reset_index(drop=True)
+
+
+def get_daily_premium_stats(premium_df):
+    """获取每日溢价率统计数据"""
+    if premium_df.empty:
+        return pd.DataFrame()
+    
+    daily_stats = premium_df.groupby('date').agg({
+        'opening_premium_rate': ['mean', 'median', 'count'],
+        'closing_premium_rate': ['mean', 'median'],
+        'limit_up_days': 'mean'
+    }).round(2)
+    
+    # 展平多重索引列名
+    daily_stats.columns = ['_'.join(col).strip() for col in daily_stats.columns.values]
+    daily_stats = daily_stats.reset_index()
+    
+    # 重命名列
+    daily_stats.rename(columns={
+        'opening_premium_rate_mean': 'avg_opening_premium',
+        'opening_premium_rate_median': 'median_opening_premium',
+        'opening_premium_rate_count': 'stock_count',
+        'closing_premium_rate_mean': 'avg_closing_premium',
+        'closing_premium_rate_median': 'median_closing_premium',
+        'limit_up_days_mean': 'avg_limit_up_days'
+    }, inplace=True)
+    
+    return daily_stats
+
+
+# 情绪值的9个因子: (列名, 名称, 权重)，每个因子得分为0-100，贡献 = 得分 * 权重，权重合计为1
+SENTIMENT_FACTORS = (
+    ('limit_up', '涨停数量', 0.15),
+    ('continuous_height', '最高连板', 0.15),
+    ('continuous_stocks', '连板数量', 0.10),
+    ('overall_rate', '整体晋级率', 0.15),
+    ('rate_1_to_2', '首板晋级率', 0.10),
+    ('success', '封板成功率', 0.10),
+    ('break_rate', '炸板率(反向)', 0.10),
+    ('opening_premium', '开盘溢价', 0.10),
+    ('closing_premium', '收盘溢价', 0.05),
+)
+SENTIMENT_WEIGHTS = np.array([weight for _, _, weight in SENTIMENT_FACTORS], dtype=np.float32)
+
+
+def calculate_sentiment_value(df):
+    """计算每日情绪值"""
+    return calculate_sentiment_factors(df)[0]
+
+
+def calculate_sentiment_factors(df):
+    """
+    计算每日情绪值及各因子的贡献
+
+    返回:
+    tuple: (每日情绪值 DataFrame, 贡献矩阵)
+    贡献矩阵为 float32 ndarray，形状 (日期数, 因子数)，行与 DataFrame 的行对应，列顺序同 SENTIMENT_FACTORS，
+    每行之和即当天情绪值
+    """
+    if df.empty:
+        return pd.DataFrame(), np.empty((0, len(SENTIMENT_FACTORS)), dtype=np.float32)
+    
+    # 各日期的计数一次 groupby 得到，不再逐日扫描全表
+    limit_up_days = df['limit_up_days']
+    limit_up = limit_up_days.notna()
+    daily = pd.DataFrame({
+        'date': df['date'],
+        'limit_up': limit_up,
+        'continuous': limit_up_days >= 2,
+        'success': limit_up & (df['break_count'] == 0),
+        'broken': limit_up & (df['break_count'] > 0),
+        'max_continuous': limit_up_days
+    }).groupby('date', sort=True).agg(
+        rows=('limit_up', 'size'),
+        limit_up=('limit_up', 'sum'),
+        continuous=('continuous', 'sum'),
+        success=('success', 'sum'),
+        broken=('broken', 'sum'),
+        max_continuous=('max_continuous', 'max')
+    )
+    dates = [pd.to_datetime(date).date() for date in daily.index]
+    
+    # 晋级率与梯队页、指标接口共用 advancement_rates，第一天没有晋级率记为0
+    rates = advancement_rates(df)
+    if rates.empty:
+        rates = pd.DataFrame(columns=['date', 'overall_rate', 'rate_1_to_2'])
+    rates = rates.set_index('date').reindex(dates)
+    overall_rate = rates['overall_rate'].fillna(0).to_numpy(dtype=float)
+    rate_1_to_2 = rates['rate_1_to_2'].fillna(0).to_numpy(dtype=float)
+    
+    # 溢价率数据，没有次日数据的日期记为0
+    premium_df = calculate_premium_rates(df)
+    daily_premium = premium_df.groupby('date').agg({
+        'opening_premium_rate': 'mean',
+        'closing_premium_rate': 'mean'
+    }).round(2).reindex(dates)
+    avg_opening_premium = daily_premium['opening_premium_rate'].fillna(0).to_numpy(dtype=float)
+    avg_closing_premium = daily_premium['closing_premium_rate'].fillna(0).to_numpy(dtype=float)
+    
+    # 1. 涨停强度指标
+    # 涨停股票数量 (按单日最多行数归一化到0-100)
+    limit_up_count = daily['limit_up'].to_numpy()
+    limit_up_score = np.minimum(100, limit_up_count / daily['rows'].max() * 100)
+    
+    # 2. 连板梯队指标
+    # 最高连板高度
+    max_continuous = daily['max_continuous'].fillna(0).to_numpy(dtype=float)
+    continuous_height_score = np.minimum(100, max_continuous / 10 * 100)
+    
+    # 连板股票数量
+    continuous_stocks_count = daily['continuous'].to_numpy()
+    max_continuous_count = continuous_stocks_count.max() if continuous_stocks_count.max() > 0 else 1
+    continuous_stocks_score = np.minimum(100, continuous_stocks_count / max_continuous_count * 100)
+    
+    # 3. 晋级效应指标
+    overall_rate_score = np.minimum(100, overall_rate)
+    rate_1_to_2_score = np.minimum(100, rate_1_to_2)
+    
+    # 4. 封板质量指标
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 封板成功率
+        success_rate = np.where(limit_up_count > 0, daily['success'].to_numpy() / limit_up_count * 100, 0)
+        # 炸板率 = 有炸板记录且炸板次数>0的股票数 / 涨停数
+        break_rate = np.where(limit_up_count > 0, daily['broken'].to_numpy() / limit_up_count * 100, 0)
+    success_score = success_rate
+    # 炸板率越高，得分越低
+    break_rate_score = 100 - np.minimum(100, break_rate)
+    
+    # 5. 赚钱效应指标
+    # 溢价率转换为0-100分，假设合理区间为-5%到10%
+    opening_premium_score = np.clip((avg_opening_premium + 5) / 15 * 100, 0, 100)
+    closing_premium_score = np.clip((avg_closing_premium + 5) / 15 * 100, 0, 100)
+    
+    # 因子得分顺序同 SENTIMENT_FACTORS
+    scores = np.column_stack([
+        limit_up_score,
+        continuous_height_score,
+        continuous_stocks_score,
+        overall_rate_score,
+        rate_1_to_2_score,
+        success_score,
+        break_rate_score,
+        opening_premium_score,
+        closing_premium_score
+    ])
+    contributions = scores.astype(np.float32) * SENTIMENT_WEIGHTS
+    
+    sentiment_df = pd.DataFrame({
+        'date': dates,
+        'limit_up_count': limit_up_count,
+        'max_continuous': max_continuous,
+        'continuous_stocks_count': continuous_stocks_count,
+        'overall_advancement_rate': overall_rate,
+        'rate_1_to_2': rate_1_to_2,
+        'success_rate': success_rate,
+        'break_rate': break_rate,
+        'avg_opening_premium': avg_opening_premium,
+        'avg_closing_premium': avg_closing_premium
+    })
+    # 确保情绪值在0-100之间
+    sentiment_df.insert(1, 'sentiment_value', np.clip(contributions.sum(axis=1, dtype=np.float64), 0, 100))
+    return sentiment_df, contributions
+
+
+def _tier_flags(df, columns):
+    """按日期汇总 limit_up_days 的各梯队条件，columns 为 {列名: 条件函数}，返回按日期升序的计数"""
+    limit_up_days = df['limit_up_days']
+    flags = pd.DataFrame({name: cond(limit_up_days) for name, cond in columns.items()})
+    flags['date'] = df['date'].to_numpy()
+    counts = flags.groupby('date', sort=True).sum().astype(int)
+    counts.index = [pd.to_datetime(date).date() for date in counts.index]
+    return counts
+
+
+def daily_tier_counts(df):
+    """
+    每日各梯队涨停数量
+
+    返回:
+    DataFrame: date, 1板, 2板, 3板, 4板, 4板以上, 总涨停，按日期升序
+    """
+    counts = _tier_flags(df, {
+        '1板': lambda d: d == 1,
+        '2板': lambda d: d == 2,
+        '3板': lambda d: d == 3,
+        '4板': lambda d: d == 4,
+        '4板以上': lambda d: d > 4,
+        '总涨停': lambda d: d.notna()
+    })
+    return counts.rename_axis('date').reset_index()[['date', '1板', '2板', '3板', '4板', '4板以上', '总涨停']]
+
+
+# 晋级率名称 -> (前一日梯队条件, 当日梯队条件)
+ADVANCEMENT_TIERS = (
+    ('1_to_2', lambda d: d == 1, lambda d: d == 2),
+    ('2_to_3', lambda d: d == 2, lambda d: d == 3),
+    ('3_to_4', lambda d: d == 3, lambda d: d == 4),
+    ('4_to_5', lambda d: d == 4, lambda d: d == 5),
+    ('5_plus', lambda d: d >= 5, lambda d: d >= 6),
+)
+
+
+def advancement_rates(df):
+    """
+    每日各梯队晋级率，前一交易日取数据中的上一个日期，第一天没有晋级率
+
+    返回:
+    DataFrame: date, rate_1_to_2 ... rate_5_plus, overall_rate 及对应的分子 n_* 和分母 d_*，按日期升序
+    """
+    columns = {}
+    for name, prev_cond, cond in ADVANCEMENT_TIERS:
+        columns[f'd_{name}'] = prev_cond
+        columns[f'n_{name}'] = cond
+    counts = _tier_flags(df, columns)
+    if len(counts) < 2:
+        return pd.DataFrame()
+    # 分母取前一个日期的计数
+    prev = counts.shift(1).iloc[1:]
+    counts = counts.iloc[1:]
+    df_rates = pd.DataFrame({'date': counts.index})
+    for name, _, _ in ADVANCEMENT_TIERS:
+        n = counts[f'n_{name}'].to_numpy()
+        d = prev[f'd_{name}'].to_numpy().astype(int)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df_rates[f'rate_{name}'] = np.where(d > 0, n / d * 100, 0)
+    for name, _, _ in ADVANCEMENT_TIERS:
+        df_rates[f'n_{name}'] = counts[f'n_{name}'].to_numpy()
+        df_rates[f'd_{name}'] = prev[f'd_{name}'].to_numpy().astype(int)
+    df_rates['d_total'] = df_rates[[f'd_{name}' for name, _, _ in ADVANCEMENT_TIERS]].sum(axis=1)
+    df_rates['n_total'] = df_rates[[f'n_{name}' for name, _, _ in ADVANCEMENT_TIERS]].sum(axis=1)
+    df_rates['overall_rate'] = np.where(df_rates['d_total'] > 0, df_rates['n_total'] / df_rates['d_total'] * 100, 0)
+    return df_rates
@@ -0,0 +1,188 @@
+"""
+只读的本地指标接口
+
+复用看板的指标计算 (market_metrics.py)，以 JSON 提供给其他工具，避免各自重复查询 MySQL。
+每次请求只读取一次数据版本 (etl_state 单行查询)；版本不变时直接使用进程内缓存，
+版本变化后重新加载数据，各指标在首次请求时计算一次。响应带 ETag (数据版本)，
+客户端携带 If-None-Match 且版本未变时返回 304。
+
+接口:
+GET /version                                    当前数据版本
+GET /metrics                                    可用指标列表
+GET /metrics/<name>?start=yyyymmdd&end=yyyymmdd  按日期范围返回指标，日期可省略
+
+只加载最近 --days 天的数据，响应中的 data_start/data_end 为已加载的日期范围，
+start 早于 data_start 时返回 400，避免把部分数据当作完整结果。
+
+用法:
+python metrics_api.py --port 8765 --days 90
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import dashboard_data
+import db
+from market_metrics import (
+    advancement_rates,
+    calculate_premium_rates,
+    calculate_sentiment_value,
+    daily_tier_counts,
+    get_daily_premium_stats,
+)
+
+# 指标名 -> 计算函数，输入为全部看板数据，返回带 date 列的 DataFrame
+METRICS = {
+    'tiers': daily_tier_counts,
+    'advancement': advancement_rates,
+    'sentiment': calculate_sentiment_value,
+    'premium': lambda df: get_daily_premium_stats(calculate_premium_rates(df)),
+}
+
+
+class MetricsCache:
+    """按数据版本缓存看板数据和已计算的指标"""
+
+    def __init__(self, days):
+        self.days = days
+        self.version = None
+        self.data = None
+        self.data_start = None
+        self.data_end = None
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def current_version(self):
+        return dashboard_data.load_data_version(db.get_engine())
+
+    def get(self, name):
+        """
+        返回:
+        tuple: (数据版本, 已加载的日期范围 (data_start, data_end), 指标 DataFrame)
+        """
+        version = self.current_version()
+        with self.lock:
+            if version != self.version:
+                logging.info("data version %s -> %s, reloading", self.version, version)
+                # 加载窗口的起点而不是数据中的最小日期，窗口开头的非交易日不算缺数据
+                self.data_start = dashboard_data.days_ago(self.days)
+                self.data = dashboard_data.load_stock_data(db.get_engine(), days=self.days)
+                self.data_end = self.data['date'].max() if not self.data.empty else None
+                self.metrics = {}
+                self.version = version
+            if name not in self.metrics:
+                self.metrics[name] = METRICS[name](self.data)
+            return self.version, (self.data_start, self.data_end), self.metrics[name]
+
+
+def parse_date(value):
+    return pd.to_datetime(value).date() if value else None
+
+
+def to_records(frame, start=None, end=None):
+    """按日期范围切片，转换为可 JSON 序列化的行 (NaN 为 null)"""
+    if frame.empty:
+        return []
+    if start is not None:
+        frame = frame[frame['date'] >= start]
+    if end is not None:
+        frame = frame[frame['date'] <= end]
+    frame = frame.assign(date=frame['date'].astype(str))
+    return json.loads(frame.to_json(orient='records', force_ascii=False))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    cache = None
+
+    def send_json(self, status, payload, etag=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag):
+        # If-None-Match 可能是逗号分隔的多个 ETag 或 *
+        tags = [t.strip() for t in (self.headers.get('If-None-Match') or '').split(',')]
+        if etag not in tags and '*' not in tags:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if parts == ['version']:
+                self.send_json(200, {'version': self.cache.current_version()})
+            elif parts == ['metrics']:
+                self.send_json(200, {'metrics': sorted(METRICS)})
+            elif len(parts) == 2 and parts[0] == 'metrics' and parts[1] in METRICS:
+                query = parse_qs(url.query)
+                start = parse_date(query.get('start', [None])[0])
+                end = parse_date(query.get('end', [None])[0])
+                version, (data_start, data_end), frame = self.cache.get(parts[1])
+                if start is not None and start < data_start:
+                    self.send_json(400, {
+                        'error': f'start {start} is before the loaded range, restart with a larger --days',
+                        'data_start': str(data_start),
+                        'data_end': str(data_end) if data_end else None
+                    })
+                    return
+                etag = f'"{version}"'
+                if self.not_modified(etag):
+                    return
+                self.send_json(200, {
+                    'metric': parts[1],
+                    'version': version,
+                    'start': str(start) if start else None,
+                    'end': str(end) if end else None,
+                    'data_start': str(data_start),
+                    'data_end': str(data_end) if data_end else None,
+                    'rows': to_records(frame, start, end)
+                }, etag=etag)
+            else:
+                self.send_json(404, {'error': f'unknown path: {url.path}'})
+        except (ValueError, pd.errors.ParserError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            logging.exception("request failed: %s", self.path)
+            self.send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        logging.info("%s %s", self.address_string(), format % args)
+
+
+def main():
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO), format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="只读的本地指标接口")
+    p.add_argument("--host", default="127.0.0.1", help="监听地址")
+    p.add_argument("--port", type=int, default=8765, help="监听端口")
+    p.add_argument("--days", type=int, default=90, help="加载最近多少天的数据")
+    args = p.parse_args()
+
+    MetricsHandler.cache = MetricsCache(args.days)
+    server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+    logging.info("serving metrics on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
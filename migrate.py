@@ -0,0 +1,200 @@
+"""
+数据库结构版本化迁移
+
+已执行的版本记录在 schema_migrations 表中，每次运行只执行未执行过的迁移。
+迁移前后对看板查询执行 EXPLAIN 并计时，便于确认索引效果。
+
+用法:
+python migrate.py            # 执行全部未执行的迁移
+python migrate.py --status   # 只查看迁移状态
+python migrate.py --explain  # 只打印看板查询的执行计划和耗时
+"""
+import argparse
+import logging
+import os
+import time
+
+from sqlalchemy import text
+
+import dashboard_data
+import db
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version int(11) NOT NULL,
+  name varchar(100) NOT NULL,
+  applied_at datetime NOT NULL,
+  PRIMARY KEY (version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+def index_exists(conn, table, index_name):
+    return conn.execute(
+        text(
+            """
+            SELECT COUNT(1) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index_name
+            """
+        ),
+        {"table": table, "index_name": index_name}
+    ).scalar() > 0
+
+
+def dedupe_and_add_unique_code_date(conn):
+    # 同一 (code, date) 只保留 id 最小 (最早写入) 的一行
+    deleted = conn.execute(text(
+        """
+        DELETE s FROM stock_model s
+        JOIN stock_model k ON k.code = s.code AND k.date = s.date AND k.id < s.id
+        """
+    )).rowcount
+    logging.info("deleted duplicate (code, date) rows: %d", deleted)
+    if not index_exists(conn, "stock_model", "uk_code_date"):
+        conn.execute(text("ALTER TABLE stock_model ADD UNIQUE KEY uk_code_date (code, date)"))
+    # 唯一键已覆盖 (code, date) 查询，原普通索引不再需要
+    if index_exists(conn, "stock_model", "idx_code_date"):
+        conn.execute(text("ALTER TABLE stock_model DROP KEY idx_code_date"))
+
+
+def add_dashboard_cover_index(conn):
+    # 看板按日期范围扫描并按 (date, limit_up_days) 排序，所需列全部放入索引，避免回表
+    if not index_exists(conn, "stock_model", "idx_dashboard_cover"):
+        conn.execute(text(
+            f"ALTER TABLE stock_model ADD KEY idx_dashboard_cover ({', '.join(dashboard_data.DASHBOARD_COLUMNS)})"
+        ))
+
+
+def create_limit_event_table(conn):
+    # merge_events 的事件按 (date, code, seconds) 拆成行，看板按日期查询分时事件
+    conn.execute(text(
+        """
+        CREATE TABLE IF NOT EXISTS stock_limit_event (
+          date date NOT NULL,
+          code varchar(10) COLLATE utf8mb4_unicode_ci NOT NULL,
+          seconds int(11) NOT NULL,
+          type tinyint(4) NOT NULL,
+          price decimal(10,2) NOT NULL,
+          volume bigint(20) DEFAULT NULL,
+          PRIMARY KEY (date, code, seconds),
+          KEY idx_date_type_seconds (date, type, seconds),
+          KEY idx_code_date (code, date)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    ))
+
+
+def column_exists(conn, table, column):
+    return conn.execute(
+        text(
+            """
+            SELECT COUNT(1) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :column
+            """
+        ),
+        {"table": table, "column": column}
+    ).scalar() > 0
+
+
+def add_updated_at(conn):
+    # 看板实时模式按 updated_at 增量拉取新增和修改的行
+    if not column_exists(conn, "stock_model", "updated_at"):
+        conn.execute(text(
+            """
+            ALTER TABLE stock_model
+            ADD COLUMN updated_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            """
+        ))
+    if not index_exists(conn, "stock_model", "idx_updated_at"):
+        conn.execute(text("ALTER TABLE stock_model ADD KEY idx_updated_at (updated_at)"))
+
+
+# (版本, 名称, 迁移函数)，版本号只增不改
+MIGRATIONS = [
+    (1, "dedupe stock_model and add unique (code, date)", dedupe_and_add_unique_code_date),
+    (2, "add covering index for dashboard query", add_dashboard_cover_index),
+    (3, "create stock_limit_event", create_limit_event_table),
+    (4, "add stock_model.updated_at for delta polling", add_updated_at),
+]
+
+
+def applied_versions(conn):
+    conn.execute(text(SCHEMA_MIGRATIONS_DDL))
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations")).fetchall()}
+
+
+def explain_dashboard(conn, days=90, repeat=3):
+    """打印看板查询的执行计划和最短耗时"""
+    params = {"min_date": dashboard_data.days_ago(days)}
+    plan = conn.execute(text("EXPLAIN " + dashboard_data.DASHBOARD_QUERY), params).mappings().all()
+    for row in plan:
+        logging.info(
+            "EXPLAIN table=%s type=%s key=%s rows=%s Extra=%s",
+            row.get('table'), row.get('type'), row.get('key'), row.get('rows'), row.get('Extra')
+        )
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(conn.execute(text(dashboard_data.DASHBOARD_QUERY), params).fetchall())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    logging.info("dashboard query: %d rows, best of %d: %.4fs", rows, repeat, best)
+    return best
+
+
+def migrate():
+    engine = db.get_engine()
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    pending = [m for m in MIGRATIONS if m[0] not in done]
+    if not pending:
+        logging.info("schema is up to date (version %d)", max(done) if done else 0)
+        return 0
+
+    with engine.connect() as conn:
+        logging.info("before migration:")
+        before = explain_dashboard(conn)
+
+    for version, name, func in pending:
+        logging.info("applying %d: %s", version, name)
+        start = time.perf_counter()
+        # MySQL 的 DDL 会隐式提交，每个迁移完成后立即记录版本
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, NOW())"),
+                {"version": version, "name": name}
+            )
+        logging.info("applied %d in %.2fs", version, time.perf_counter() - start)
+
+    with engine.connect() as conn:
+        logging.info("after migration:")
+        after = explain_dashboard(conn)
+    logging.info("dashboard query time: %.4fs -> %.4fs", before, after)
+    return len(pending)
+
+
+def main():
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO), format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="数据库结构版本化迁移")
+    p.add_argument("--status", action="store_true", help="只查看迁移状态")
+    p.add_argument("--explain", action="store_true", help="只打印看板查询的执行计划和耗时")
+    args = p.parse_args()
+
+    if args.status:
+        with db.transaction() as conn:
+            done = applied_versions(conn)
+        for version, name, _ in MIGRATIONS:
+            logging.info("%s %d: %s", "applied" if version in done else "pending", version, name)
+        return
+    if args.explain:
+        with db.get_engine().connect() as conn:
+            explain_dashboard(conn)
+        return
+    applied = migrate()
+    logging.info("completed. applied migrations: %d", applied)
+
+
+if __name__ == "__main__":
+    main()
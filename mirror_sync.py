@@ -0,0 +1,280 @@
+"""
+stock_model / stock_limit_event 的本地分析镜像 (DuckDB)
+
+按日期增量同步: 每次运行找出 updated_at 不早于上次水位的日期 (索引 idx_updated_at)，
+把这些日期的全部行整体替换进本地 DuckDB，同一日期内被删除的行也会同步。
+某个日期的行在 MySQL 中被全部删除时不会出现在 updated_at 中，因此增量同步后再按日期
+核对两边各表的行数，行数不一致的日期整体重新同步。
+DuckDB 在写连接打开期间不允许其他进程读取，因此同步在镜像的副本上进行，
+完成后用 os.replace 原子替换，看板读取不会被同步阻塞，也不会阻塞同步。
+镜像同时记录同步时 MySQL 的数据版本，看板切换到镜像后据此判断是否需要重新加载。
+
+看板和指标接口设置 DASHBOARD_BACKEND=duckdb 后，所有查询改为读取本镜像。
+reprocess_events.py --rebuild-events 只重写事件、不更新 stock_model.updated_at，之后需要 --full 重建。
+
+镜像文件位置: MIRROR_PATH，默认 ./data/mirror.duckdb
+
+用法:
+python mirror_sync.py                        # 增量同步
+python mirror_sync.py --full                 # 清空后全量重建
+python mirror_sync.py --parquet ./data/parquet  # 同步后导出 Parquet 供分析使用
+"""
+import argparse
+import logging
+import os
+import shutil
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+import db
+
+MIRROR_PATH = os.getenv(
+    "MIRROR_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mirror.duckdb")
+)
+
+# 镜像表结构: 表名 -> ((列名, DuckDB 类型), ...)
+# time 列存为 INTERVAL，读出后与从 MySQL 读取一样是 timedelta
+MIRROR_TABLES = {
+    'stock_model': (
+        ('id', 'BIGINT'),
+        ('date', 'DATE'),
+        ('name', 'VARCHAR'),
+        ('code', 'VARCHAR'),
+        ('market_capitalization', 'BIGINT'),
+        ('circulating_market_capitalization', 'BIGINT'),
+        ('real_circulating_capitalization', 'BIGINT'),
+        ('price', 'DOUBLE'),
+        ('volume', 'BIGINT'),
+        ('turnover_rate', 'DOUBLE'),
+        ('real_turnover_rate', 'DOUBLE'),
+        ('outside_volume', 'BIGINT'),
+        ('inside_volume', 'BIGINT'),
+        ('buy_1_vol', 'BIGINT'),
+        ('first_volume', 'BIGINT'),
+        ('first_price', 'DOUBLE'),
+        ('last_volume', 'BIGINT'),
+        ('last_price', 'DOUBLE'),
+        ('first_seal_time', 'INTERVAL'),
+        ('last_seal_time', 'INTERVAL'),
+        ('first_break_time', 'INTERVAL'),
+        ('last_break_time', 'INTERVAL'),
+        ('break_count', 'INTEGER'),
+        ('dc_first_seal_time', 'INTERVAL'),
+        ('dc_last_seal_time', 'INTERVAL'),
+        ('dc_break_count', 'INTEGER'),
+        ('limit_up_statistics', 'VARCHAR'),
+        ('limit_up_days', 'INTEGER'),
+        ('amplitude', 'DOUBLE'),
+        ('industry', 'VARCHAR'),
+        ('events', 'VARCHAR'),
+        ('updated_at', 'TIMESTAMP'),
+    ),
+    'stock_limit_event': (
+        ('date', 'DATE'),
+        ('code', 'VARCHAR'),
+        ('seconds', 'INTEGER'),
+        ('type', 'TINYINT'),
+        ('price', 'DOUBLE'),
+        ('volume', 'BIGINT'),
+    ),
+}
+
+# 每批同步的日期数
+SYNC_BATCH_DATES = 20
+
+# 只读打开遇到文件锁时的重试次数和间隔 (秒)
+READ_RETRIES = 5
+READ_RETRY_INTERVAL = 1
+
+WATERMARK_STATE = "watermark"
+DATA_VERSION_STATE = "data_version"
+
+
+def connect():
+    """
+    只读打开镜像，遇到文件锁时重试
+
+    返回:
+    duckdb.DuckDBPyConnection
+    """
+    import duckdb
+
+    if not os.path.exists(MIRROR_PATH):
+        raise FileNotFoundError(f"镜像不存在: {MIRROR_PATH}，请先运行 python mirror_sync.py")
+    for attempt in range(1, READ_RETRIES + 1):
+        try:
+            return duckdb.connect(MIRROR_PATH, read_only=True)
+        except duckdb.IOException as e:
+            if attempt == READ_RETRIES:
+                raise
+            logging.warning("mirror is locked, retry %d/%d: %s", attempt, READ_RETRIES, e)
+            time.sleep(READ_RETRY_INTERVAL)
+
+
+def _open_for_write(path):
+    """读写打开 path (镜像的副本)，不存在时创建表"""
+    import duckdb
+
+    conn = duckdb.connect(path)
+    for table, columns in MIRROR_TABLES.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{c} {t}' for c, t in columns)})")
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name VARCHAR PRIMARY KEY, value VARCHAR)")
+    return conn
+
+
+def get_state(conn, name, default=None):
+    row = conn.execute("SELECT value FROM sync_state WHERE name = ?", [name]).fetchone()
+    return default if row is None else row[0]
+
+
+def set_state(conn, name, value):
+    conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", [name, str(value)])
+
+
+def synced_data_version():
+    """
+    返回:
+    str: 镜像最近一次同步时 MySQL 的数据版本，从未同步时为 '0'
+    """
+    with connect() as conn:
+        return get_state(conn, DATA_VERSION_STATE, "0")
+
+
+def changed_dates(conn, since):
+    """
+    返回:
+    DataFrame: date, updated_at (该日期最新写入时间)，since 为空时返回全部日期
+    """
+    where = "" if since is None else "WHERE updated_at >= :since"
+    return pd.read_sql(
+        text(f"SELECT date, MAX(updated_at) AS updated_at FROM stock_model {where} GROUP BY date ORDER BY date"),
+        conn, params={} if since is None else {"since": since}
+    )
+
+
+def copy_dates(mysql_conn, mirror, dates):
+    """把若干日期的行从 MySQL 整体替换进镜像，单个事务内完成"""
+    params = {f"d{i}": d for i, d in enumerate(dates)}
+    placeholders = ", ".join(f":d{i}" for i in range(len(dates)))
+    frames = {
+        table: pd.read_sql(
+            text(f"SELECT {', '.join(c for c, _ in columns)} FROM {table} WHERE date IN ({placeholders})"),
+            mysql_conn, params=params
+        )
+        for table, columns in MIRROR_TABLES.items()
+    }
+    batch_dates = pd.DataFrame({'date': pd.to_datetime(list(dates))})
+    mirror.execute("BEGIN TRANSACTION")
+    try:
+        mirror.register('batch_dates', batch_dates)
+        for table, columns in MIRROR_TABLES.items():
+            mirror.execute(f"DELETE FROM {table} WHERE date IN (SELECT CAST(date AS DATE) FROM batch_dates)")
+            if frames[table].empty:
+                continue
+            mirror.register('batch_rows', frames[table])
+            mirror.execute(
+                f"INSERT INTO {table} SELECT {', '.join(f'CAST({c} AS {t})' for c, t in columns)} FROM batch_rows"
+            )
+            mirror.unregister('batch_rows')
+        mirror.unregister('batch_dates')
+        mirror.execute("COMMIT")
+    except Exception:
+        mirror.execute("ROLLBACK")
+        raise
+    return len(frames['stock_model'])
+
+
+def diverged_dates(mysql_conn, mirror):
+    """
+    按日期核对 MySQL 与镜像中各表的行数
+
+    返回:
+    list: 行数不一致 (包括只在一边存在) 的日期，升序
+    """
+    dates = set()
+    for table in MIRROR_TABLES:
+        source = pd.read_sql(text(f"SELECT date, COUNT(*) AS n FROM {table} GROUP BY date"), mysql_conn)
+        local = mirror.execute(f"SELECT date, COUNT(*) AS n FROM {table} GROUP BY date").df()
+        for frame in (source, local):
+            frame['date'] = pd.to_datetime(frame['date']).dt.date
+        counts = source.merge(local, on='date', how='outer', suffixes=('_mysql', '_mirror')).fillna(0)
+        dates.update(counts.loc[counts['n_mysql'] != counts['n_mirror'], 'date'])
+    return sorted(dates)
+
+
+def sync(full=False):
+    """
+    增量同步镜像
+
+    参数:
+    full: 为 True 时清空镜像后全量同步
+
+    返回:
+    int: 写入镜像的 stock_model 行数
+    """
+    engine = db.get_engine()
+    copied = 0
+    # 在副本上同步，全量时从空文件开始
+    os.makedirs(os.path.dirname(MIRROR_PATH), exist_ok=True)
+    work_path = MIRROR_PATH + ".sync"
+    for path in (work_path, work_path + ".wal"):
+        if os.path.exists(path):
+            os.remove(path)
+    if not full and os.path.exists(MIRROR_PATH):
+        shutil.copyfile(MIRROR_PATH, work_path)
+
+    with _open_for_write(work_path) as mirror, engine.connect() as conn:
+        # 先读版本再同步，同步期间的新写入留给下次
+        version = db.get_data_version(conn=conn)
+        since = get_state(mirror, WATERMARK_STATE)
+        # updated_at 为秒级精度，水位当秒的写入可能尚未同步，按 >= 重新同步该秒所在日期
+        changes = changed_dates(conn, since)
+        dates = [pd.to_datetime(d).date() for d in changes['date']]
+        logging.info("mirror watermark %s, %d dates to sync", since, len(dates))
+        for i in range(0, len(dates), SYNC_BATCH_DATES):
+            batch = dates[i:i + SYNC_BATCH_DATES]
+            copied += copy_dates(conn, mirror, batch)
+            logging.info("synced %d/%d dates (%s ~ %s)", min(i + SYNC_BATCH_DATES, len(dates)), len(dates), batch[0], batch[-1])
+        # 整个日期被删除时 updated_at 中没有记录，按行数核对后重新同步
+        if not full:
+            diverged = diverged_dates(conn, mirror)
+            if diverged:
+                logging.warning("%d dates differ in row count, resyncing: %s", len(diverged), ", ".join(map(str, diverged[:10])))
+            for i in range(0, len(diverged), SYNC_BATCH_DATES):
+                copied += copy_dates(conn, mirror, diverged[i:i + SYNC_BATCH_DATES])
+        if not changes.empty:
+            set_state(mirror, WATERMARK_STATE, pd.Timestamp(changes['updated_at'].max()).isoformat(sep=' '))
+        set_state(mirror, DATA_VERSION_STATE, version)
+    # 连接关闭时已写入检查点，副本是完整的单个文件
+    os.replace(work_path, MIRROR_PATH)
+    return copied
+
+
+def export_parquet(directory):
+    """把镜像中的表导出为 Parquet 文件，每个表一个文件"""
+    os.makedirs(directory, exist_ok=True)
+    with connect() as mirror:
+        for table in MIRROR_TABLES:
+            path = os.path.join(directory, f"{table}.parquet")
+            mirror.execute(f"COPY {table} TO '{path}' (FORMAT PARQUET)")
+            logging.info("exported %s -> %s", table, path)
+
+
+def main():
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO), format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="同步 stock_model 到本地 DuckDB 镜像")
+    p.add_argument("--full", action="store_true", help="清空镜像后全量同步")
+    p.add_argument("--parquet", default=None, help="同步后把镜像导出为 Parquet 到该目录")
+    args = p.parse_args()
+
+    copied = sync(full=args.full)
+    logging.info("completed. rows synced: %d", copied)
+    if args.parquet:
+        export_parquet(args.parquet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+情绪值权重离线优化
+
+情绪值的9个因子权重 (market_metrics.SENTIMENT_FACTORS) 为人工设定。本脚本先构建一次
+日期 × 因子的得分矩阵，再随机采样大量权重向量 (Dirichlet 分布，权重非负且合计为1)，
+用一次矩阵乘法得到所有候选的每日情绪值，并与前瞻结果序列批量计算相关系数，
+按训练区间的相关系数排序，在留出的最近一段日期上检验。
+
+前瞻结果 (均取数据中的下一个交易日，避免与当天因子重叠):
+    next_opening_premium   次日涨停股的平均开盘溢价率
+    next_closing_premium   次日涨停股的平均收盘溢价率
+    next_advancement_rate  次日整体晋级率
+
+用法:
+python optimize_sentiment_weights.py --days 1095 --candidates 20000 --target next_opening_premium
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import dashboard_data
+import db
+from market_metrics import SENTIMENT_FACTORS, SENTIMENT_WEIGHTS, calculate_sentiment_factors
+
+# 前瞻结果名称 -> 情绪值表中的列，统一向后平移一个交易日
+OUTCOMES = {
+    'next_opening_premium': 'avg_opening_premium',
+    'next_closing_premium': 'avg_closing_premium',
+    'next_advancement_rate': 'overall_advancement_rate',
+}
+
+# 每次矩阵乘法的候选数，控制 (日期数 × 候选数) 中间结果的内存
+CHUNK_SIZE = 5000
+
+
+def build_factor_matrix(df):
+    """
+    构建因子得分矩阵和前瞻结果，去掉没有次日结果的日期
+
+    返回:
+    tuple: (日期数组, 得分矩阵 float32 (日期数, 因子数)，得分为0-100, 结果矩阵 float32 (日期数, 结果数))
+    """
+    sentiment_df, contributions = calculate_sentiment_factors(df)
+    if sentiment_df.empty:
+        return np.array([]), np.empty((0, len(SENTIMENT_FACTORS)), np.float32), np.empty((0, len(OUTCOMES)), np.float32)
+    scores = contributions / SENTIMENT_WEIGHTS
+    outcomes = pd.DataFrame({name: sentiment_df[col].shift(-1) for name, col in OUTCOMES.items()})
+    valid = outcomes.notna().all(axis=1).to_numpy()
+    return sentiment_df['date'].to_numpy()[valid], scores[valid], outcomes[valid].to_numpy(np.float32)
+
+
+def sample_weights(n, alpha=1.0, seed=None):
+    """
+    返回:
+    ndarray: float32 (n + 1, 因子数)，第0行为当前权重，其余为 Dirichlet 采样
+    """
+    rng = np.random.default_rng(seed)
+    sampled = rng.dirichlet(np.full(len(SENTIMENT_FACTORS), alpha), size=n).astype(np.float32)
+    return np.vstack([SENTIMENT_WEIGHTS, sampled])
+
+
+def correlations(scores, weights, outcomes):
+    """
+    全部候选权重的情绪值与各结果序列的 Pearson 相关系数
+
+    参数:
+    scores: 得分矩阵 (日期数, 因子数)
+    weights: 候选权重 (候选数, 因子数)
+    outcomes: 结果矩阵 (日期数, 结果数)
+
+    返回:
+    ndarray: float32 (候选数, 结果数)，序列无波动时为0
+    """
+    y = outcomes - outcomes.mean(axis=0)
+    y_norm = np.linalg.norm(y, axis=0)
+    result = np.zeros((len(weights), outcomes.shape[1]), dtype=np.float32)
+    for i in range(0, len(weights), CHUNK_SIZE):
+        # (日期数, 因子数) @ (因子数, 候选数) -> 每列为一组权重的每日情绪值
+        values = scores @ weights[i:i + CHUNK_SIZE].T
+        values -= values.mean(axis=0)
+        denom = np.outer(np.linalg.norm(values, axis=0), y_norm)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[i:i + CHUNK_SIZE] = np.where(denom > 0, (values.T @ y) / denom, 0)
+    return result
+
+
+def format_weights(weights):
+    return " ".join(f"{name}={w * 100:.1f}%" for (_, name, _), w in zip(SENTIMENT_FACTORS, weights))
+
+
+def optimize(scores, outcomes, target, candidates=20000, alpha=1.0, holdout=0.3, top=10, seed=None):
+    """
+    在训练区间按 target 的相关系数排序候选权重，并计算留出区间的相关系数
+
+    返回:
+    DataFrame: 前 top 名及当前权重 (candidate=0)，列为 candidate, rank, weights, train_<结果>, test_<结果>
+    """
+    names = list(OUTCOMES)
+    split = int(len(scores) * (1 - holdout))
+    weights = sample_weights(candidates, alpha, seed)
+
+    train = correlations(scores[:split], weights, outcomes[:split])
+    # 留出区间太短时相关系数没有意义
+    test = correlations(scores[split:], weights, outcomes[split:]) if len(scores) - split >= 3 else np.full_like(train, np.nan)
+
+    target_corr = train[:, names.index(target)]
+    order = np.argsort(-target_corr, kind='stable')
+    ranks = np.empty(len(order), dtype=int)
+    ranks[order] = np.arange(1, len(order) + 1)
+    picked = list(order[:top]) + ([0] if 0 not in order[:top] else [])
+
+    report = pd.DataFrame({'candidate': picked, 'rank': ranks[picked]})
+    report['weights'] = [weights[i] for i in picked]
+    for j, name in enumerate(names):
+        report[f'train_{name}'] = train[picked, j]
+        report[f'test_{name}'] = test[picked, j]
+    return report
+
+
+def main():
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO), format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="情绪值权重离线优化")
+    p.add_argument("--days", type=int, default=1095, help="使用最近多少天的数据")
+    p.add_argument("--candidates", type=int, default=20000, help="采样的候选权重数")
+    p.add_argument("--alpha", type=float, default=1.0, help="Dirichlet 浓度参数，越大越接近均匀权重")
+    p.add_argument("--target", choices=list(OUTCOMES), default='next_opening_premium', help="排序依据的前瞻结果")
+    p.add_argument("--holdout", type=float, default=0.3, help="留作检验的最近日期比例")
+    p.add_argument("--top", type=int, default=10, help="输出前多少名")
+    p.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = p.parse_args()
+
+    start = time.perf_counter()
+    df = dashboard_data.load_stock_data(db.get_engine(), days=args.days)
+    dates, scores, outcomes = build_factor_matrix(df)
+    logging.info("factor matrix: %d dates x %d factors, built in %.2fs", len(dates), scores.shape[1], time.perf_counter() - start)
+    if len(dates) < 10:
+        logging.error("not enough dates to optimize: %d", len(dates))
+        return
+
+    start = time.perf_counter()
+    report = optimize(scores, outcomes, args.target, args.candidates, args.alpha, args.holdout, args.top, args.seed)
+    logging.info("evaluated %d candidates in %.2fs (train %s ~ %s)", args.candidates + 1, time.perf_counter() - start,
+                 dates[0], dates[int(len(dates) * (1 - args.holdout)) - 1])
+
+    for row in report.itertuples(index=False):
+        label = "current" if row.candidate == 0 else f"#{row.rank}"
+        logging.info(
+            "%s rank=%d train=%.4f test=%.4f | %s", label, row.rank,
+            getattr(row, f"train_{args.target}"), getattr(row, f"test_{args.target}"), format_weights(row.weights)
+        )
+        logging.info(
+            "    %s", " ".join(f"{name}: train={getattr(row, f'train_{name}'):.4f} test={getattr(row, f'test_{name}'):.4f}" for name in OUTCOMES)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+基于本地归档的分笔数据重算历史封板/炸板事件
+
+检测逻辑调整后，对指定日期范围内已归档的 (date, code) 在进程池上重新运行 merge_events，
+只更新 stock_model 中由事件派生的列:
+first_seal_time, last_seal_time, first_break_time, last_break_time, break_count, events
+并同步替换 stock_limit_event 中对应 (date, code) 的事件行。
+--rebuild-events 时不论是否变化，为库中已有的全部 (date, code) 重写事件行。
+--backfill-events 不读取归档，直接把 stock_model.events 拆分写入 stock_limit_event，
+用于补齐没有归档分笔数据的历史日期。
+
+用法:
+python reprocess_events.py --start 2025-11-01 --end 2025-12-03 --dry-run
+python reprocess_events.py --start 2025-11-01 --end 2025-12-03 --workers 8
+python reprocess_events.py --start 2025-11-01 --end 2025-12-03 --rebuild-events
+python reprocess_events.py --start 2024-01-01 --end 2025-12-03 --backfill-events
+"""
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import db
+import tick_archive
+from limit_events import EVENT_COLUMNS, event_rows, merge_events, summarize_events
+
+UPDATE_BATCH_SIZE = 500
+TIME_COLUMNS = ('first_seal_time', 'last_seal_time', 'first_break_time', 'last_break_time')
+
+
+def detect_archived(date, code, limit_price, archive_root):
+    """
+    在子进程中读取归档分笔数据并重算事件
+
+    返回:
+    dict: date, code 以及事件派生列
+    """
+    tick_df = tick_archive.load_ticks(date, code, archive_root)
+    summary = summarize_events(merge_events(tick_df, limit_price))
+    return {'date': date, 'code': code, **summary}
+
+
+def run_detection(manifest, workers, archive_root):
+    """
+    在进程池上并行重算，按完成数量打印进度
+
+    返回:
+    list: 重算结果，失败的 (date, code) 只记录日志
+    """
+    total = len(manifest)
+    step = max(1, total // 20)
+    results = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(detect_archived, r.date, r.code, float(r.limit_price), archive_root): (r.date, r.code)
+            for r in manifest.itertuples(index=False)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            date, code = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failed += 1
+                logging.error("detect failed for %s %s: %s", date, code, e)
+            if done % step == 0 or done == total:
+                logging.info("progress %d/%d (failed %d)", done, total, failed)
+    return results
+
+
+def normalize_time(value):
+    """把 TIME 列 (timedelta) 或字符串统一成 %H:%M:%S，空值返回 None"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'total_seconds'):
+        total_seconds = int(value.total_seconds())
+        return f"{total_seconds // 3600:02d}:{total_seconds % 3600 // 60:02d}:{total_seconds % 60:02d}"
+    return str(value).split('.')[0]
+
+
+def normalize_events(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def load_current(start_date, end_date):
+    """读取日期范围内当前的事件派生列，按 (date, code) 索引"""
+    current = db.read_df(
+        f"""
+        SELECT date, code, {', '.join(EVENT_COLUMNS)}
+        FROM stock_model
+        WHERE date BETWEEN :start AND :end
+        """,
+        {"start": start_date, "end": end_date}
+    )
+    current['date'] = pd.to_datetime(current['date']).dt.strftime('%Y-%m-%d')
+    return {(r['date'], r['code']): r for r in current.to_dict('records')}
+
+
+def diff_results(results, current):
+    """
+    对比重算结果与库中数据
+
+    返回:
+    tuple: (需要更新的行, 各行变化的列 {(date, code): {列: (旧值, 新值)}})，库中不存在的行不更新
+    """
+    updates = []
+    changes = {}
+    for new in results:
+        key = (new['date'], new['code'])
+        old = current.get(key)
+        if old is None:
+            continue
+        changed = {}
+        for col in TIME_COLUMNS:
+            if normalize_time(old[col]) != new[col]:
+                changed[col] = (normalize_time(old[col]), new[col])
+        if int(old['break_count'] or 0) != new['break_count']:
+            changed['break_count'] = (old['break_count'], new['break_count'])
+        if normalize_events(old['events']) != json.loads(new['events']):
+            changed['events'] = (old['events'], new['events'])
+        if changed:
+            updates.append(new)
+            changes[key] = changed
+    return updates, changes
+
+
+def apply_updates(updates):
+    """按批次 executemany 更新事件派生列，同一事务内替换 stock_limit_event 中的事件行"""
+    stmt = f"""
+        UPDATE stock_model
+        SET {', '.join(f'{col} = :{col}' for col in EVENT_COLUMNS)}
+        WHERE code = :code AND date = :date
+    """
+    applied = 0
+    for i in range(0, len(updates), UPDATE_BATCH_SIZE):
+        batch = updates[i:i + UPDATE_BATCH_SIZE]
+        with db.transaction() as conn:
+            db.execute(stmt, batch, conn=conn)
+            db.replace_limit_events(event_items(batch), conn=conn)
+            db.bump_data_version(conn=conn)
+        applied += len(batch)
+        logging.info("updated %d/%d rows", applied, len(updates))
+    return applied
+
+
+def event_items(results):
+    return [(r['date'], r['code'], event_rows(r['events'])) for r in results]
+
+
+def rebuild_events(results, current):
+    """为库中已有的 (date, code) 重写 stock_limit_event，不修改 stock_model"""
+    existing = [r for r in results if (r['date'], r['code']) in current]
+    written = 0
+    for i in range(0, len(existing), UPDATE_BATCH_SIZE):
+        batch = existing[i:i + UPDATE_BATCH_SIZE]
+        with db.transaction() as conn:
+            written += db.replace_limit_events(event_items(batch), conn=conn)
+            db.bump_data_version(conn=conn)
+        logging.info("rebuilt events for %d/%d (date, code)", min(i + UPDATE_BATCH_SIZE, len(existing)), len(existing))
+    return written
+
+
+def backfill_events(start_date, end_date):
+    """
+    把日期范围内 stock_model.events 拆分写入 stock_limit_event，不依赖归档分笔数据
+
+    返回:
+    int: 写入的事件行数
+    """
+    current = db.read_df(
+        """
+        SELECT date, code, events
+        FROM stock_model
+        WHERE date BETWEEN :start AND :end AND events IS NOT NULL
+        ORDER BY date, code
+        """,
+        {"start": start_date, "end": end_date}
+    )
+    items = []
+    for r in current.itertuples(index=False):
+        events = r.events if isinstance(r.events, str) else json.dumps(r.events, ensure_ascii=False)
+        try:
+            items.append((pd.to_datetime(r.date).strftime('%Y-%m-%d'), r.code, event_rows(events)))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error("skip malformed events for %s %s: %s", r.date, r.code, e)
+    logging.info("backfilling events for %d (date, code)", len(items))
+
+    written = 0
+    for i in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = items[i:i + UPDATE_BATCH_SIZE]
+        with db.transaction() as conn:
+            written += db.replace_limit_events(batch, conn=conn)
+            db.bump_data_version(conn=conn)
+        logging.info("backfilled %d/%d (date, code)", min(i + UPDATE_BATCH_SIZE, len(items)), len(items))
+    return written
+
+
+def main():
+    logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO), format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="基于归档分笔数据重算历史封板/炸板事件")
+    p.add_argument("--start", required=True, help="开始日期 yyyy-mm-dd")
+    p.add_argument("--end", required=True, help="结束日期 yyyy-mm-dd")
+    p.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数，默认使用全部CPU")
+    p.add_argument("--archive-dir", default=tick_archive.ARCHIVE_DIR, help="分笔数据归档目录")
+    p.add_argument("--dry-run", action="store_true", help="只打印差异，不写库")
+    p.add_argument("--rebuild-events", action="store_true", help="为全部已入库的 (date, code) 重写 stock_limit_event")
+    p.add_argument("--backfill-events", action="store_true", help="不读取归档，把 stock_model.events 拆分写入 stock_limit_event")
+    args = p.parse_args()
+
+    if args.backfill_events:
+        written = backfill_events(args.start, args.end)
+        logging.info("completed. backfilled stock_limit_event rows: %d", written)
+        return
+
+    manifest = tick_archive.read_manifest(args.start, args.end, args.archive_dir)
+    missing_limit = manifest['limit_price'].isna()
+    if missing_limit.any():
+        logging.warning("skip %d archived rows without limit price", int(missing_limit.sum()))
+        manifest = manifest[~missing_limit]
+    if manifest.empty:
+        logging.info("no archived ticks in %s -> %s", args.start, args.end)
+        return
+    logging.info("reprocessing %d archived (date, code) with %d workers", len(manifest), args.workers)
+
+    results = run_detection(manifest, args.workers, args.archive_dir)
+    current = load_current(args.start, args.end)
+    updates, changes = diff_results(results, current)
+    logging.info("rows changed: %d / %d", len(updates), len(results))
+
+    if args.dry_run:
+        for (date, code), changed in sorted(changes.items()):
+            for col, (old, new) in changed.items():
+                if col == 'events':
+                    print(f"{date} {code} events: {len(normalize_events(old) or [])} -> {len(json.loads(new))} 个事件")
+                else:
+                    print(f"{date} {code} {col}: {old} -> {new}")
+        return
+
+    applied = apply_updates(updates)
+    logging.info("completed. updated rows: %d", applied)
+    if args.rebuild_events:
+        written = rebuild_events(results, current)
+        logging.info("rebuilt stock_limit_event rows: %d", written)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+每日采集运行日志
+
+用本地 SQLite 记录每个 (date, code, stage) 的完成情况和阶段结果，
+重新运行时已完成的阶段直接复用结果，不再重复请求接口和等待。
+失败的股票写入重试列表，不中断整个运行；再次运行同一日期时重试列表中的股票优先处理。
+
+日志文件位置: RUN_JOURNAL_PATH，默认 ./data/run_journal.sqlite
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+
+JOURNAL_PATH = os.getenv(
+    "RUN_JOURNAL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "run_journal.sqlite")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage (
+    run_date TEXT NOT NULL,
+    code TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    payload TEXT,
+    finished_at TEXT NOT NULL,
+    PRIMARY KEY (run_date, code, stage)
+);
+CREATE TABLE IF NOT EXISTS retry (
+    run_date TEXT NOT NULL,
+    code TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (run_date, code)
+);
+"""
+
+
+def _connect():
+    os.makedirs(os.path.dirname(JOURNAL_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOURNAL_PATH)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _json_default(value):
+    # akshare 返回的数值多为 numpy 类型
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def get_stage(run_date, code, stage):
+    """
+    读取已完成阶段的结果
+
+    返回:
+    tuple: (是否已完成, 阶段结果)
+    """
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT payload FROM stage WHERE run_date = ? AND code = ? AND stage = ?",
+            (str(run_date), code, stage)
+        ).fetchone()
+    if row is None:
+        return False, None
+    return True, json.loads(row[0]) if row[0] is not None else None
+
+
+def finish_stage(run_date, code, stage, payload=None):
+    """记录阶段完成，payload 需可 JSON 序列化"""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO stage (run_date, code, stage, payload, finished_at) VALUES (?, ?, ?, ?, ?)",
+            (str(run_date), code, stage,
+             json.dumps(payload, ensure_ascii=False, default=_json_default) if payload is not None else None,
+             _now())
+        )
+
+
+def run_stage(run_date, code, stage, func):
+    """
+    已完成的阶段直接返回记录的结果，否则执行 func 并记录
+
+    返回:
+    func 的返回值 (经过 JSON 往返，数值为 Python 原生类型)
+    """
+    done, payload = get_stage(run_date, code, stage)
+    if done:
+        print(f"复用已完成阶段: {run_date} {code} {stage}")
+        return payload
+    payload = func()
+    finish_stage(run_date, code, stage, payload)
+    return json.loads(json.dumps(payload, default=_json_default)) if payload is not None else None
+
+
+def add_retry(run_date, code, error):
+    """把失败的股票加入重试列表，累计失败次数"""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            """
+            INSERT INTO retry (run_date, code, attempts, last_error, updated_at) VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (run_date, code) DO UPDATE SET
+                attempts = attempts + 1, last_error = excluded.last_error, updated_at = excluded.updated_at
+            """,
+            (str(run_date), code, str(error), _now())
+        )
+
+
+def clear_retry(run_date, code):
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM retry WHERE run_date = ? AND code = ?", (str(run_date), code))
+
+
+def list_retries(run_date):
+    """
+    返回:
+    list: [(code, attempts, last_error)]
+    """
+    with closing(_connect()) as conn:
+        return conn.execute(
+            "SELECT code, attempts, last_error FROM retry WHERE run_date = ? ORDER BY code",
+            (str(run_date),)
+        ).fetchall()
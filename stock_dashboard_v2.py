@@ -1,292 +1,211 @@
+import os
+import time
 import warnings
-from datetime import timedelta
 
-import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from sqlalchemy import create_engine
+
+import dashboard_data
+import db
+import trading_calendar
+from market_metrics import (
+    SENTIMENT_FACTORS,
+    SENTIMENT_WEIGHTS,
+    advancement_rates,
+    calculate_premium_rates,
+    calculate_sentiment_factors,
+    calculate_sentiment_value,
+    daily_tier_counts,
+    filter_data_by_date_range,
+    get_daily_premium_stats,
+)
 
 warnings.filterwarnings('ignore')
 
 
-@st.cache_data(ttl=18000)  # 缓存5小时 (5 * 60 * 60 = 18000秒)
-def get_stock_data():
-    """从数据库获取股票数据"""
+def get_db_engine():
+    """按 st.secrets 中的配置获取连接池引擎"""
+    return db.get_engine(db.build_dsn(
+        host=st.secrets.ops_db.host,
+        user=st.secrets.ops_db.username,
+        password=st.secrets.ops_db.password,
+        database=st.secrets.ops_db.database,
+        charset='utf8mb4'
+    ))
+
+
+def current_data_version():
+    """
+    每次运行都读取数据版本 (etl_state 单行主键查询，镜像模式下为镜像同步到的版本)，版本变化时缓存自动失效
+
+    返回:
+    str: 数据版本；读取失败时退化为每5小时变化一次的时间片
+    """
     try:
-        engine = create_engine(
-            # f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
-            f"mysql+pymysql://{st.secrets.ops_db.username}:{st.secrets.ops_db.password}@{st.secrets.ops_db.host}/{st.secrets.ops_db.database}?charset=utf8mb4"
-        )
-        
-        query = """
-        SELECT 
-            date,
-            name,
-            code,
-            price,
-            first_price,
-            last_price,
-            volume,
-            turnover_rate,
-            real_turnover_rate,
-            limit_up_days,
-            limit_up_statistics,
-            first_seal_time,
-            last_seal_time,
-            dc_first_seal_time,
-            dc_last_seal_time,
-            first_break_time,
-            last_break_time,
-            dc_break_count as break_count,
-            amplitude,
-            industry
-        FROM stock_model 
-        WHERE date >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-        ORDER BY date DESC, limit_up_days DESC
-        """
-        
-        df = pd.read_sql(query, engine)
-        engine.dispose()
-        
-        # 确保日期格式一致
-        df['date'] = pd.to_datetime(df['date']).dt.date
-        return df
+        return dashboard_data.load_data_version(get_db_engine())
+    except Exception:
+        return f"t{int(time.time() // 18000)}"
+
+
+# 缓存以数据版本为键，不再按固定时间过期，只保留最近两个版本
+# 读取失败时抛出异常，失败结果不进入缓存，下次运行重新读取
+@st.cache_data(max_entries=2)
+def load_stock_data_cached(version):
+    """读取看板数据，version 只用作缓存键"""
+    return dashboard_data.load_stock_data(get_db_engine())
+
+
+def get_stock_data(version):
+    """从数据库获取股票数据，失败时返回空表"""
+    try:
+        return load_stock_data_cached(version)
     except Exception as e:
         st.error(f"数据库连接失败: {str(e)}")
         return pd.DataFrame()
 
-def filter_data_by_date_range(df, date_range):
-    """根据日期范围筛选数据"""
-    if len(date_range) == 2:
-        start_date = pd.to_datetime(date_range[0]).date()
-        end_date = pd.to_datetime(date_range[1]).date()
-        return df[(df['date'] >= start_date) & (df['date'] <= end_date)].copy()
-    return df.copy()
-
-def calculate_premium_rates(df):
-    """计算涨停股票第二天的溢价率"""
-    premium_data = []
-    
-    # 按股票代码和日期排序
-    df_sorted = df.sort_values(['code', 'date']).reset_index(drop=True)
-    
-    for i in range(len(df_sorted) - 1):
-        current_row = df_sorted.iloc[i]
-        next_row = df_sorted.iloc[i + 1]
-        
-        # 确保是同一只股票且是下一个交易日(不要求严格连续1天)
-        if (current_row['code'] == next_row['code'] and 
-            pd.to_datetime(next_row['date']) > pd.to_datetime(current_row['date']) and
-            pd.notna(current_row['limit_up_days'])):  # 确保当天是涨停股票
-            
-            # 计算第二天开盘价溢价率 (这里用当日收盘价作为开盘价近似)
-            next_day_open_price = next_row['first_price']
-            limit_up_price = current_row['price']
-            
-            # 第二天开盘价溢价率 = (次日开盘价 - 涨停价) / 涨停价 * 100%
-            opening_premium_rate = ((next_day_open_price - limit_up_price) / limit_up_price) * 100
-            
-            # 第二天收盘价较前一天涨停价溢价率
-            next_day_close_price = next_row['last_price']
-            closing_premium_rate = ((next_day_close_price - limit_up_price) / limit_up_price) * 100
-            
-            premium_data.append({
-                'date': pd.to_datetime(current_row['date']).date(),
-                'code': current_row['code'],
-                'name': current_row['name'],
-                'limit_up_price': limit_up_price,
-                'limit_up_statistics': current_row['limit_up_statistics'] if pd.notna(current_row['limit_up_statistics']) else '',
-                'next_day_open_price': next_day_open_price,
-                'next_day_close_price': next_day_close_price,
-                'opening_premium_rate': opening_premium_rate,
-                'closing_premium_rate': closing_premium_rate,
-                'limit_up_days': current_row['limit_up_days'],
-                'industry': current_row['industry'],
-                'amplitude': current_row['amplitude']
-            })
-    
-    return pd.DataFrame(premium_data)
 
-def get_daily_premium_stats(premium_df):
-    """获取每日溢价率统计数据"""
-    if premium_df.empty:
-        return pd.DataFrame()
-    
-    daily_stats = premium_df.groupby('date').agg({
-        'opening_premium_rate': ['mean', 'median', 'count'],
-        'closing_premium_rate': ['mean', 'median'],
-        'limit_up_days': 'mean'
-    }).round(2)
-    
-    # 展平多重索引列名
-    daily_stats.columns = ['_'.join(col).strip() for col in daily_stats.columns.values]
-    daily_stats = daily_stats.reset_index()
-    
-    # 重命名列
-    daily_stats.rename(columns={
-        'opening_premium_rate_mean': 'avg_opening_premium',
-        'opening_premium_rate_median': 'median_opening_premium',
-        'opening_premium_rate_count': 'stock_count',
-        'closing_premium_rate_mean': 'avg_closing_premium',
-        'closing_premium_rate_median': 'median_closing_premium',
-        'limit_up_days_mean': 'avg_limit_up_days'
-    }, inplace=True)
-    
-    return daily_stats
+@st.cache_data(max_entries=32)
+def load_limit_events_cached(date, version):
+    """读取某一天的封板/炸板事件和按5分钟统计的炸板次数，version 只用作缓存键"""
+    engine = get_db_engine()
+    return dashboard_data.load_limit_events(engine, date), dashboard_data.load_break_histogram(engine, date)
 
-def calculate_sentiment_value(df):
-    """计算每日情绪值"""
-    # 先计算晋级率数据
-    dates = sorted(df['date'].unique())
-    advancement_data = {}
-    
-    for i in range(1, len(dates)):
-        date = dates[i]
-        prev_date = dates[i-1]
-        today = df[df['date'] == date]
-        prev_day = df[df['date'] == prev_date]
-        
-        # 计算各梯队晋级率
-        d1 = (prev_day['limit_up_days'] == 1).sum()
-        n2 = (today['limit_up_days'] == 2).sum()
-        r12 = (n2 / d1 * 100) if d1 > 0 else 0
-        
-        d2 = (prev_day['limit_up_days'] == 2).sum()
-        n3 = (today['limit_up_days'] == 3).sum()
-        r23 = (n3 / d2 * 100) if d2 > 0 else 0
-        
-        d3 = (prev_day['limit_up_days'] == 3).sum()
-        n4 = (today['limit_up_days'] == 4).sum()
-        r34 = (n4 / d3 * 100) if d3 > 0 else 0
-        
-        d4 = (prev_day['limit_up_days'] == 4).sum()
-        n5 = (today['limit_up_days'] == 5).sum()
-        r45 = (n5 / d4 * 100) if d4 > 0 else 0
-        
-        d5p = (prev_day['limit_up_days'] >= 5).sum()
-        n6p = (today['limit_up_days'] >= 6).sum()
-        r5p6p = (n6p / d5p * 100) if d5p > 0 else 0
-        
-        # 计算整体晋级率
-        d_total = d1 + d2 + d3 + d4 + d5p
-        n_total = n2 + n3 + n4 + n5 + n6p
-        overall_rate = (n_total / d_total * 100) if d_total > 0 else 0
-        
-        advancement_data[date] = {
-            'overall_rate': overall_rate,
-            'rate_1_to_2': r12
-        }
-    
-    # 计算溢价率数据
-    premium_df = calculate_premium_rates(df)
-    premium_stats = {}
-    
-    if not premium_df.empty:
-        daily_premium = premium_df.groupby('date').agg({
-            'opening_premium_rate': 'mean',
-            'closing_premium_rate': 'mean'
-        }).round(2)
-        
-        for date, row in daily_premium.iterrows():
-            premium_stats[date] = {
-                'avg_opening_premium': row['opening_premium_rate'],
-                'avg_closing_premium': row['closing_premium_rate']
-            }
-    
-    # 计算每日情绪值
-    daily_stats = []
-    all_dates = sorted(df['date'].unique())
-    
-    for date in all_dates:
-        day_data = df[df['date'] == date].copy()
-        
-        # 1. 涨停强度指标
-        # 涨停股票数量 (归一化到0-100)
-        limit_up_count = len(day_data[day_data['limit_up_days'].notna()])
-        max_count = df.groupby('date').size().max()
-        limit_up_score = min(100, (limit_up_count / max_count) * 100) * 0.15
-        
-        # 2. 连板梯队指标
-        # 最高连板高度
-        max_continuous = day_data['limit_up_days'].max()
-        if pd.isna(max_continuous):
-            continuous_height_score = 0
-        else:
-            continuous_height_score = min(100, (max_continuous / 10) * 100) * 0.15
-        
-        # 连板股票数量
-        continuous_stocks_count = len(day_data[day_data['limit_up_days'] >= 2])
-        max_continuous_count = df[df['limit_up_days'] >= 2].groupby('date').size().max() if len(df[df['limit_up_days'] >= 2]) > 0 else 1
-        continuous_stocks_score = min(100, (continuous_stocks_count / max_continuous_count) * 100) * 0.10
-        
-        # 3. 晋级效应指标
-        overall_rate = advancement_data[date]['overall_rate'] if date in advancement_data else 0
-        overall_rate_score = min(100, overall_rate) * 0.15
-        
-        rate_1_to_2 = advancement_data[date]['rate_1_to_2'] if date in advancement_data else 0
-        rate_1_to_2_score = min(100, rate_1_to_2) * 0.10
-        
-        # 4. 封板质量指标
-        # 封板成功率
-        total_limit_up = len(day_data[day_data['limit_up_days'].notna()])
-        if total_limit_up > 0:
-            success_count = len(day_data[(day_data['limit_up_days'].notna()) & (day_data['break_count'] == 0)])
-            success_rate = (success_count / total_limit_up) * 100
-        else:
-            success_rate = 0
-        success_score = success_rate * 0.10
-        
-        # 炸板率
-        touched_limit = len(day_data[day_data['limit_up_days'].notna()])
-        if touched_limit > 0:
-            # 炸板股票数 = 有炸板记录且炸板次数>0的股票数
-            break_stocks = len(day_data[(day_data['limit_up_days'].notna()) & (day_data['break_count'] > 0)])
-            break_rate = (break_stocks / touched_limit) * 100 if touched_limit > 0 else 0
-        else:
-            break_rate = 0
-        # 炸板率越高，得分越低
-        break_rate_score = (100 - min(100, break_rate)) * 0.10
-        
-        # 5. 赚钱效应指标
-        avg_opening_premium = premium_stats[date]['avg_opening_premium'] if date in premium_stats else 0
-        # 溢价率转换为0-100分，假设合理区间为-5%到10%
-        opening_premium_score = min(100, max(0, (avg_opening_premium + 5) / 15 * 100)) * 0.10
-        
-        avg_closing_premium = premium_stats[date]['avg_closing_premium'] if date in premium_stats else 0
-        closing_premium_score = min(100, max(0, (avg_closing_premium + 5) / 15 * 100)) * 0.05
-        
-        # 计算总情绪值
-        sentiment_value = (
-            limit_up_score + 
-            continuous_height_score + 
-            continuous_stocks_score +
-            overall_rate_score +
-            rate_1_to_2_score +
-            success_score +
-            break_rate_score +
-            opening_premium_score +
-            closing_premium_score
+
+def get_limit_events(date, version):
+    """获取某一天的分时事件，失败时返回空表"""
+    try:
+        return load_limit_events_cached(date, version)
+    except Exception as e:
+        st.error(f"获取分时事件失败: {str(e)}")
+        return pd.DataFrame(), pd.DataFrame()
+
+
+@st.cache_resource(max_entries=2)
+def get_code_index(version):
+    """
+    按代码排序的数据和 code -> (start, stop) 行范围索引，随数据版本缓存
+
+    用 cache_resource 在会话间共享同一个对象，cache_data 每次重跑都会反序列化整表和索引，
+    调用方只切片或复制，不修改该对象
+    """
+    return dashboard_data.build_code_index(load_stock_data_cached(version))
+
+
+@st.cache_data(max_entries=2)
+def get_sentiment_factors(version):
+    """全部日期的情绪值和因子贡献矩阵，随数据版本缓存"""
+    return calculate_sentiment_factors(load_stock_data_cached(version))
+
+
+@st.cache_data(max_entries=2)
+def get_industry_stats(version):
+    """按 (日期, 行业) 预聚合的涨停统计，随数据版本缓存"""
+    return dashboard_data.industry_daily_stats(load_stock_data_cached(version))
+
+
+EVENT_TYPE_NAMES = {1: '封板', 2: '回封', 3: '炸板'}
+EVENT_TYPE_COLORS = {'封板': '#d62728', '回封': '#ff7f0e', '炸板': '#2ca02c'}
+
+
+def seconds_to_clock(seconds):
+    """距0点秒数 -> 当天时刻 (绘图用，日期固定为 1900-01-01)"""
+    return pd.Timestamp('1900-01-01') + pd.to_timedelta(seconds, unit='s')
+
+
+def show_limit_event_timeline(selected_date, day_stocks, version):
+    """
+    展示选定日期的分时封板/炸板时间线和炸板时间分布
+
+    参数:
+    selected_date: 日期
+    day_stocks: 当天的股票数据，用于显示股票名称和连板天数
+    version: 数据版本
+    """
+    st.header("⏱️ 分时封板/炸板时间线")
+    events, histogram = get_limit_events(pd.to_datetime(selected_date).date(), version)
+    if events.empty:
+        st.info(f"{selected_date} 暂无分时事件数据")
+        return
+
+    names = day_stocks.drop_duplicates('code').set_index('code')
+    events['股票'] = events['code'] + ' ' + events['code'].map(names['name']).fillna('')
+    events['事件'] = events['type'].map(EVENT_TYPE_NAMES)
+    events['时间'] = seconds_to_clock(events['seconds'])
+    # 按首个事件时间排列股票，越早封板越靠上
+    order = events.groupby('股票')['seconds'].min().sort_values().index.tolist()
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        fig = px.scatter(
+            events, x='时间', y='股票', color='事件',
+            color_discrete_map=EVENT_TYPE_COLORS,
+            hover_data={'price': ':.2f', 'volume': True, '时间': '|%H:%M:%S'},
+            category_orders={'股票': order},
+            title=f'{selected_date} 封板/炸板时间线'
         )
-        
-        # 确保情绪值在0-100之间
-        sentiment_value = max(0, min(100, sentiment_value))
-        
-        daily_stats.append({
-            'date': pd.to_datetime(date).date(),
-            'sentiment_value': sentiment_value,
-            'limit_up_count': limit_up_count,
-            'max_continuous': max_continuous if pd.notna(max_continuous) else 0,
-            'continuous_stocks_count': continuous_stocks_count,
-            'overall_advancement_rate': advancement_data[date]['overall_rate'] if date in advancement_data else 0,
-            'rate_1_to_2': advancement_data[date]['rate_1_to_2'] if date in advancement_data else 0,
-            'success_rate': success_rate,
-            'break_rate': break_rate,
-            'avg_opening_premium': avg_opening_premium,
-            'avg_closing_premium': avg_closing_premium
-        })
-    
-    return pd.DataFrame(daily_stats)
+        fig.update_xaxes(tickformat='%H:%M')
+        fig.update_layout(height=max(400, 18 * len(order)))
+        st.plotly_chart(fig, key="limit_event_timeline")
+    with col2:
+        if histogram.empty:
+            st.info("当天没有炸板")
+        else:
+            histogram['时间段'] = seconds_to_clock(histogram['bucket']).dt.strftime('%H:%M')
+            fig = px.bar(
+                histogram, x='时间段', y='break_count',
+                labels={'break_count': '炸板次数'},
+                title='炸板时间分布 (5分钟)'
+            )
+            fig.update_layout(height=400)
+            st.plotly_chart(fig, key="break_time_histogram")
+
+def show_stock_drilldown(code, history):
+    """
+    单只股票的历史: 价格、换手率、连板天数、封板时间、次日溢价率
+
+    参数:
+    code: 股票代码
+    history: dashboard_data.stock_history 的结果
+    """
+    if history.empty:
+        st.info(f"{code} 暂无历史数据")
+        return
+    st.subheader(f"🔍 {code} {history['name'].iloc[-1]} 历史走势")
+    history = history.assign(
+        date_str=history['date'].astype(str),
+        limit_up_days=history['limit_up_days'].fillna(0),
+        first_seal=seconds_to_clock(pd.to_timedelta(history['dc_first_seal_time']).dt.total_seconds()),
+        last_seal=seconds_to_clock(pd.to_timedelta(history['dc_last_seal_time']).dt.total_seconds())
+    )
+    labels = {
+        'date_str': '日期', 'value': '数值', 'variable': '类别',
+        'price': '涨停价/收盘价', 'first_price': '开盘价', 'last_price': '尾盘价',
+        'turnover_rate': '换手率', 'real_turnover_rate': '真实换手率', 'limit_up_days': '连板天数',
+        'first_seal': '首次封板', 'last_seal': '最后封板',
+        'opening_premium_rate': '次日开盘溢价(%)', 'closing_premium_rate': '次日收盘溢价(%)'
+    }
+
+    left_col, right_col = st.columns(2)
+    with left_col:
+        fig = px.line(history, x='date_str', y=['price', 'first_price', 'last_price'], title='价格', labels=labels, markers=True)
+        fig.update_xaxes(type='category')
+        st.plotly_chart(fig, key="drilldown_price")
+        fig = px.bar(history, x='date_str', y='limit_up_days', title='连板天数', labels=labels)
+        fig.update_xaxes(type='category')
+        st.plotly_chart(fig, key="drilldown_streak")
+        fig = px.bar(history, x='date_str', y=['opening_premium_rate', 'closing_premium_rate'], barmode='group', title='次日溢价率', labels=labels)
+        fig.update_xaxes(type='category')
+        st.plotly_chart(fig, key="drilldown_premium")
+    with right_col:
+        fig = px.line(history, x='date_str', y=['turnover_rate', 'real_turnover_rate'], title='换手率(%)', labels=labels, markers=True)
+        fig.update_xaxes(type='category')
+        st.plotly_chart(fig, key="drilldown_turnover")
+        fig = px.scatter(history, x='date_str', y=['first_seal', 'last_seal'], title='封板时间', labels=labels)
+        fig.update_xaxes(type='category')
+        fig.update_yaxes(tickformat='%H:%M')
+        st.plotly_chart(fig, key="drilldown_seal_time")
+
 
 def create_chart_with_date_filter(title, df, chart_func, default_days=30):
     """创建带日期筛选的图表"""
@@ -296,7 +215,9 @@ def create_chart_with_date_filter(title, df, chart_func, default_days=30):
     col1, col2, col3 = st.columns([2, 2, 6])
     with col1:
         if not df.empty:
-            default_start = df['date'].max() - timedelta(days=default_days)
+            # 默认显示最近 default_days 个交易日
+            default_start = trading_calendar.offset_trading_day(df['date'].max(), -(default_days - 1))
+            default_start = max(default_start.date(), df['date'].min()) if default_start is not None else df['date'].min()
             start_date = st.date_input(
                 "开始日期",
                 value=default_start,
@@ -327,6 +248,226 @@ def create_chart_with_date_filter(title, df, chart_func, default_days=30):
     else:
         st.info("暂无数据或日期范围无效")
 
+def show_sentiment_attribution(sentiment_df, contributions):
+    """
+    情绪值因子贡献: 按日期堆叠的贡献图和单日拆解，直接切片贡献矩阵，不重新计算因子
+
+    参数:
+    sentiment_df, contributions: calculate_sentiment_factors 的结果，行一一对应
+    """
+    factor_names = [name for _, name, _ in SENTIMENT_FACTORS]
+
+    def create_attribution_chart(filtered_df):
+        if filtered_df.empty:
+            st.info("暂无情绪指数数据")
+            return
+        # sentiment_df 为默认 RangeIndex，筛选后的索引即贡献矩阵的行号
+        rows = contributions[filtered_df.index.to_numpy()]
+        date_str = filtered_df['date'].astype(str).to_numpy()
+        long_df = pd.DataFrame(rows, columns=factor_names).assign(date_str=date_str).melt(
+            id_vars=['date_str'], var_name='因子', value_name='贡献'
+        )
+        fig = px.bar(
+            long_df,
+            x='date_str',
+            y='贡献',
+            color='因子',
+            category_orders={'因子': factor_names},
+            title='每日情绪值因子贡献',
+            labels={'date_str': '日期', '贡献': '贡献(分)'}
+        )
+        fig.update_xaxes(type='category')
+        fig.update_layout(barmode='stack', height=450)
+        st.plotly_chart(fig, key="sentiment_attribution_chart")
+
+        # 单日拆解
+        col1, col2 = st.columns([2, 8])
+        with col1:
+            day = st.selectbox("拆解日期", list(date_str[::-1]), key="sentiment_attribution_date")
+        row = rows[list(date_str).index(day)]
+        breakdown = pd.DataFrame({
+            '因子': factor_names,
+            '权重': SENTIMENT_WEIGHTS,
+            '得分': row / SENTIMENT_WEIGHTS,
+            '贡献': row
+        }).round(2)
+        left_col, right_col = st.columns(2)
+        with left_col:
+            st.write(f"{day} 情绪值 {row.sum():.1f}")
+            st.dataframe(breakdown, width='stretch', hide_index=True)
+        with right_col:
+            fig_day = px.bar(breakdown, x='贡献', y='因子', orientation='h', title=f'{day} 因子贡献')
+            fig_day.update_yaxes(categoryorder='array', categoryarray=factor_names[::-1])
+            fig_day.update_layout(height=400)
+            st.plotly_chart(fig_day, key="sentiment_attribution_day")
+
+    create_chart_with_date_filter("情绪值因子贡献", sentiment_df, create_attribution_chart)
+
+
+# 行业轮动热力图的指标、展示的行业数和每天高亮的领涨行业数
+INDUSTRY_METRICS = {'涨停数': 'limit_up_count', '最高板': 'max_height', '晋级率(%)': 'advancement_rate'}
+INDUSTRY_TOP_N = 20
+LEADING_INDUSTRY_COUNT = 3
+
+
+def show_industry_rotation(industry_stats):
+    """
+    行业轮动: 行业 × 日期热力图，星标为当天领涨行业
+
+    参数:
+    industry_stats: get_industry_stats 的结果
+    """
+    st.header("🔄 行业轮动")
+
+    def create_industry_heatmap(filtered_df):
+        if filtered_df.empty:
+            st.info("暂无数据")
+            return
+        metric_label = st.radio("指标", list(INDUSTRY_METRICS), horizontal=True, key="industry_metric")
+        metric = INDUSTRY_METRICS[metric_label]
+
+        # 只展示区间内涨停数最多的行业，以及出现过领涨的行业
+        leaders = filtered_df[filtered_df['rank'] <= LEADING_INDUSTRY_COUNT]
+        industries = list(filtered_df.groupby('industry')['limit_up_count'].sum().nlargest(INDUSTRY_TOP_N).index)
+        industries += [i for i in leaders['industry'].unique() if i not in industries]
+        shown = filtered_df[filtered_df['industry'].isin(industries)].assign(date_str=lambda d: d['date'].astype(str))
+        leaders = leaders.assign(date_str=leaders['date'].astype(str))
+
+        heatmap = shown.pivot(index='industry', columns='date_str', values=metric).reindex(industries)
+        fig = px.imshow(
+            heatmap,
+            aspect='auto',
+            color_continuous_scale='Reds',
+            labels={'x': '日期', 'y': '行业', 'color': metric_label},
+            title=f'行业{metric_label}热力图'
+        )
+        fig.add_scatter(
+            x=leaders['date_str'],
+            y=leaders['industry'],
+            mode='markers',
+            marker=dict(symbol='star', size=10, color='gold', line=dict(width=1, color='black')),
+            customdata=leaders[['rank', 'limit_up_count', 'max_height']],
+            hovertemplate='<b>%{y}</b> %{x}<br>领涨第%{customdata[0]}名<br>涨停数: %{customdata[1]}<br>最高板: %{customdata[2]}<extra></extra>',
+            name='领涨行业'
+        )
+        fig.update_xaxes(type='category')
+        fig.update_layout(height=max(400, 24 * len(industries)))
+        st.plotly_chart(fig, key="industry_heatmap")
+
+        # 区间最后一天的领涨行业
+        last_date = filtered_df['date'].max()
+        top = filtered_df[(filtered_df['date'] == last_date) & (filtered_df['rank'] <= LEADING_INDUSTRY_COUNT)]
+        st.write(f"🏆 {last_date} 领涨行业")
+        st.dataframe(
+            top[['rank', 'industry', 'limit_up_count', 'max_height', 'advancement_rate']].rename(columns={
+                'rank': '排名', 'industry': '行业', 'limit_up_count': '涨停数',
+                'max_height': '最高板', 'advancement_rate': '晋级率(%)'
+            }).round(1),
+            width='stretch', hide_index=True
+        )
+
+    create_chart_with_date_filter("行业轮动热力图", industry_stats, create_industry_heatmap)
+
+
+# 实时模式轮询间隔 (秒) 和回放倍速
+LIVE_INTERVAL = int(os.getenv("DASHBOARD_LIVE_INTERVAL", "10"))
+REPLAY_SPEED = int(os.getenv("DASHBOARD_REPLAY_SPEED", "60"))
+
+
+def live_snapshot(today, prev_day):
+    """
+    当天的汇总指标，口径与 calculate_sentiment_value 一致，只计算当天一个点
+
+    返回:
+    dict: 涨停数、最高连板、连板股数、封板成功率、炸板率、晋级率
+    """
+    limit_up = today[today['limit_up_days'].notna()]
+    total = len(limit_up)
+    promoted = (today['limit_up_days'] >= 2).sum()
+    candidates = prev_day['limit_up_days'].notna().sum()
+    return {
+        '涨停数': total,
+        '最高连板': int(limit_up['limit_up_days'].max()) if total > 0 else 0,
+        '连板股数': int(promoted),
+        '封板成功率': (limit_up['break_count'] == 0).sum() / total * 100 if total > 0 else 0,
+        '炸板率': (limit_up['break_count'] > 0).sum() / total * 100 if total > 0 else 0,
+        '晋级率': promoted / candidates * 100 if candidates > 0 else 0,
+    }
+
+
+def live_ladder(today):
+    """当天的连板梯队: 每个连板高度一行，股票按东财首次封板时间排列"""
+    limit_up = today[today['limit_up_days'].notna()].copy()
+    if limit_up.empty:
+        return pd.DataFrame(columns=['连板天数', '数量', '股票'])
+    limit_up['seal'] = pd.to_timedelta(limit_up['dc_first_seal_time'])
+    limit_up = limit_up.sort_values(['limit_up_days', 'seal'], ascending=[False, True])
+    return limit_up.groupby('limit_up_days', sort=False).agg(
+        数量=('code', 'size'),
+        股票=('name', lambda names: '、'.join(names))
+    ).reset_index().rename(columns={'limit_up_days': '连板天数'}).astype({'连板天数': int})
+
+
+def start_live(df, source):
+    """初始化实时模式的会话状态"""
+    state = st.session_state
+    state.live_source = source
+    state.live_started = time.time()
+    if source == '回放':
+        # 以最近一个交易日为"今天"回放，内存数据中先去掉这一天
+        replay_date = df['date'].max()
+        state.live_today = replay_date
+        state.replay_day = df[df['date'] == replay_date]
+        state.live_frame = df[df['date'] != replay_date].copy()
+        state.live_since = 0
+    else:
+        state.live_today = pd.Timestamp.now().date()
+        state.live_frame = df.copy()
+        try:
+            db_now = dashboard_data.load_db_now(get_db_engine())
+        except Exception as e:
+            st.error(f"读取数据库时间失败: {str(e)}")
+            db_now = pd.NaT
+        # 增量起点取数据库时间的当天零点，updated_at 由数据库写入，与本机时钟无关
+        state.live_since = (db_now if pd.notna(db_now) else pd.Timestamp.now()).normalize()
+    prev_date = trading_calendar.prev_trading_day(state.live_today)
+    state.live_prev_date = prev_date.date() if prev_date is not None else None
+
+
+@st.fragment(run_every=LIVE_INTERVAL)
+def show_live_panel():
+    """每 LIVE_INTERVAL 秒拉取一次增量，只重算当天的梯队和汇总指标"""
+    state = st.session_state
+    if state.live_source == '回放':
+        changes, state.live_since = dashboard_data.replay_changes(
+            state.replay_day, time.time() - state.live_started, state.live_since, REPLAY_SPEED
+        )
+        clock = seconds_to_clock(state.live_since).strftime('%H:%M:%S')
+    else:
+        try:
+            changes = dashboard_data.load_changes_since(
+                get_db_engine(), state.live_since, state.live_prev_date or state.live_today
+            )
+        except Exception as e:
+            st.error(f"拉取增量失败: {str(e)}")
+            return
+        if not changes.empty:
+            state.live_since = changes['updated_at'].max()
+        clock = pd.Timestamp.now().strftime('%H:%M:%S')
+    state.live_frame = dashboard_data.merge_changes(state.live_frame, changes)
+
+    frame = state.live_frame
+    today = frame[frame['date'] == state.live_today]
+    prev_day = frame[frame['date'] == state.live_prev_date]
+    st.caption(f"{state.live_today} {clock} ({state.live_source}) 本次更新 {len(changes)} 行，每 {LIVE_INTERVAL} 秒刷新")
+
+    snapshot = live_snapshot(today, prev_day)
+    cols = st.columns(len(snapshot))
+    for col, (label, value) in zip(cols, snapshot.items()):
+        col.metric(label, f"{value:.1f}%" if label.endswith('率') else int(value))
+    st.dataframe(live_ladder(today), width='stretch', hide_index=True)
+
+
 def main():
     st.set_page_config(
         page_title="数据分析看板",
@@ -339,15 +480,31 @@ def main():
     st.markdown("---")
     
     # 获取数据
+    version = current_data_version()
     with st.spinner("正在加载数据..."):
-        df = get_stock_data()
+        df = get_stock_data(version)
     
     if df.empty:
         st.error("无法获取数据，请检查数据库连接")
         return
     
+    # 0. 实时模式: 盘中只增量刷新当天数据，历史部分不重新加载和计算
+    col1, col2, col3 = st.columns([2, 2, 6])
+    with col1:
+        live = st.toggle("实时模式", key="live_mode")
+    with col2:
+        source = st.radio("数据来源", ['数据库', '回放'], horizontal=True, key="live_source_choice")
+    if live:
+        if st.session_state.get('live_source') != source or 'live_frame' not in st.session_state:
+            start_live(df, source)
+        st.header("🔴 盘中实时")
+        show_live_panel()
+        st.markdown("---")
+    else:
+        st.session_state.pop('live_frame', None)
+    
     # 计算统计数据
-    sentiment_df = calculate_sentiment_value(df)
+    sentiment_df, sentiment_contributions = get_sentiment_factors(version)
     premium_df = calculate_premium_rates(df)
     
     # 1. 每日涨停连板梯队表
@@ -368,17 +525,18 @@ def main():
     
     # 获取选定日期的涨停股票
     selected_stocks = df[df['date'] == pd.to_datetime(selected_date).date()].copy()
+    by_code, code_index = get_code_index(version)
     
-    # 计算每只股票近30天内的涨停板数量
+    # 计算每只股票近30个交易日内的涨停板数量
     def calculate_30day_limit_up_count(stock_code, target_date):
-        # 计算30天前的日期
-        date_obj = pd.to_datetime(target_date)
-        start_date = (date_obj - pd.Timedelta(days=29)).date()  # 包含当天，共30天
+        # 往前推29个交易日，包含当天共30个交易日
+        start_ts = trading_calendar.offset_trading_day(target_date, -29)
+        start_date = start_ts.date() if start_ts is not None else df['date'].min()
         
-        # 筛选该股票在指定日期范围内的涨停记录
-        stock_data = df[(df['code'] == stock_code) & 
-                        (df['date'] >= start_date) & 
-                        (df['date'] <= target_date)].copy()
+        # 筛选该股票在指定日期范围内的涨停记录 (按行范围索引切片，不扫描全表)
+        start, stop = code_index.get(stock_code, (0, 0))
+        stock_data = by_code.iloc[start:stop]
+        stock_data = stock_data[(stock_data['date'] >= start_date) & (stock_data['date'] <= target_date)]
         
         # 计算涨停次数（limit_up_days不为空或limit_up_statistics表明有涨停）
         limit_up_count = 0
@@ -608,11 +766,22 @@ def main():
             for temp_col in temp_cols:
                 ranking_df = ranking_df.drop(temp_col, axis=1)
         
-        # 显示排序后的表格
-        st.dataframe(ranking_df, width='stretch', hide_index=True)
+        # 显示排序后的表格，选中一行查看该股票的历史
+        event = st.dataframe(
+            ranking_df, width='stretch', hide_index=True,
+            on_select='rerun', selection_mode='single-row', key="ranking_table"
+        )
+        if event.selection.rows:
+            code = ranking_df.iloc[event.selection.rows[0]]['股票代码']
+            show_stock_drilldown(code, dashboard_data.stock_history(by_code, code_index, code))
+        else:
+            st.caption("选中表格中的一行查看该股票的历史走势")
     else:
         st.info(f"{selected_date} 暂无涨停股票数据")
     
+    # 分时封板/炸板时间线
+    show_limit_event_timeline(selected_date, selected_stocks, version)
+    
     # 连板高度趋势
     def create_continuous_height_chart(filtered_df):
         # 获取每日最高连板高度
@@ -695,20 +864,7 @@ def main():
         if filtered_df.empty:
             st.info("暂无数据")
             return
-        dates = sorted(filtered_df['date'].unique())
-        rows = []
-        for date in dates:
-            d = filtered_df[filtered_df['date'] == date]['limit_up_days']
-            rows.append({
-                'date': pd.to_datetime(date).date(),
-                '1板': int((d == 1).sum()),
-                '2板': int((d == 2).sum()),
-                '3板': int((d == 3).sum()),
-                '4板': int((d == 4).sum()),
-                '4板以上': int((d > 4).sum()),
-                '总涨停': int(d.notna().sum())
-            })
-        counts_df = pd.DataFrame(rows)
+        counts_df = daily_tier_counts(filtered_df)
         counts_df['date_str'] = counts_df['date'].astype(str)
         _ticks = counts_df['date_str'].tolist()
         _tickvals_5 = [_ticks[i] for i in range(0, len(_ticks), 5)]
@@ -756,53 +912,10 @@ def main():
 
     # 晋级率趋势
     def create_advancement_rate_chart(filtered_df):
-        dates = sorted(filtered_df['date'].unique())
-        rows = []
-        for i in range(1, len(dates)):
-            date = dates[i]
-            prev_date = dates[i-1]
-            today = filtered_df[filtered_df['date'] == date]
-            prev_day = filtered_df[filtered_df['date'] == prev_date]
-            d1 = (prev_day['limit_up_days'] == 1).sum()
-            n2 = (today['limit_up_days'] == 2).sum()
-            r12 = (n2 / d1 * 100) if d1 > 0 else 0
-            d2 = (prev_day['limit_up_days'] == 2).sum()
-            n3 = (today['limit_up_days'] == 3).sum()
-            r23 = (n3 / d2 * 100) if d2 > 0 else 0
-            d3 = (prev_day['limit_up_days'] == 3).sum()
-            n4 = (today['limit_up_days'] == 4).sum()
-            r34 = (n4 / d3 * 100) if d3 > 0 else 0
-            d4 = (prev_day['limit_up_days'] == 4).sum()
-            n5 = (today['limit_up_days'] == 5).sum()
-            r45 = (n5 / d4 * 100) if d4 > 0 else 0
-            d5p = (prev_day['limit_up_days'] >= 5).sum()
-            n6p = (today['limit_up_days'] >= 6).sum()
-            r5p6p = (n6p / d5p * 100) if d5p > 0 else 0
-            rows.append({
-                'date': pd.to_datetime(date).date(),
-                'rate_1_to_2': r12,
-                'rate_2_to_3': r23,
-                'rate_3_to_4': r34,
-                'rate_4_to_5': r45,
-                'rate_5_plus': r5p6p,
-                'n_1_to_2': n2,
-                'd_1_to_2': d1,
-                'n_2_to_3': n3,
-                'd_2_to_3': d2,
-                'n_3_to_4': n4,
-                'd_3_to_4': d3,
-                'n_4_to_5': n5,
-                'd_4_to_5': d4,
-                'n_5_plus': n6p,
-                'd_5_plus': d5p,
-                'd_total': d1 + d2 + d3 + d4 + d5p,
-                'n_total': n2 + n3 + n4 + n5 + n6p
-            })
-        if len(rows) == 0:
+        df_rates = advancement_rates(filtered_df)
+        if df_rates.empty:
             st.info("暂无晋级率数据")
             return
-        df_rates = pd.DataFrame(rows)
-        df_rates['overall_rate'] = np.where(df_rates['d_total'] > 0, df_rates['n_total'] / df_rates['d_total'] * 100, 0)
         df_rates['ma3_1_to_2'] = df_rates['rate_1_to_2'].rolling(window=3).mean()
         df_rates['ma3_2_to_3'] = df_rates['rate_2_to_3'].rolling(window=3).mean()
         df_rates['ma3_3_to_4'] = df_rates['rate_3_to_4'].rolling(window=3).mean()
@@ -1116,6 +1229,7 @@ def main():
             st.info("暂无情绪指数数据")
     
     create_chart_with_date_filter("市场情绪指数", df, create_sentiment_chart)
+    show_sentiment_attribution(sentiment_df, sentiment_contributions)
     
     # 6. 溢价率分析
     if not premium_df.empty:
@@ -1263,6 +1377,9 @@ def main():
 
     create_chart_with_date_filter("昨日涨停溢价成功率", df, create_yesterday_premium_success_charts)
 
+    # 行业轮动
+    show_industry_rotation(get_industry_stats(version))
+
     # 数据概览
     st.header("📊 数据概览")
     col1, col2, col3, col4 = st.columns(4)
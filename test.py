@@ -1,6 +1,7 @@
-import pymysql
 import pandas as pd
 
+import db
+
 def get_count_stocks(date):
     """
     从数据库获取昨日涨停的股票数量
@@ -12,44 +13,19 @@ def get_count_stocks(date):
     返回:
     int: 符合条件的股票数量
     """
-
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
     try:
-        with connection.cursor() as cursor:
-            # 查询昨日涨停的股票数据
-            query = """
-                SELECT *
-                FROM stock_model
-                where date = %s 
-            """
-            cursor.execute(query, (date,))
-            result = cursor.fetchall()
-            return result
+        # 查询昨日涨停的股票数据
+        query = """
+            SELECT *
+            FROM stock_model
+            where date = :date 
+        """
+        return db.fetch_all(query, {"date": date})
 
     except Exception as e:
         print(f"查询昨日涨停股票时出错: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
-
 
 def get_count(date):
     """
@@ -62,46 +38,21 @@ def get_count(date):
     返回:
     int: 符合条件的股票数量
     """
-
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
     try:
-        with connection.cursor() as cursor:
-            # 查询昨日涨停的股票数据
-            query = """
-                SELECT count(*) as count
-                FROM stock_model
-                where date = %s 
-                and limit_up_days is not null
-                
-            """
-            cursor.execute(query, (date,))
-            result = cursor.fetchall()
-            return result[0]['count']
+        # 查询昨日涨停的股票数据
+        query = """
+            SELECT count(*) as count
+            FROM stock_model
+            where date = :date 
+            and limit_up_days is not null
+            
+        """
+        return db.fetch_scalar(query, {"date": date})
 
     except Exception as e:
         print(f"查询昨日涨停股票时出错: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
-
 
 def get_stock(date,code):
     """
@@ -114,78 +65,31 @@ def get_stock(date,code):
     返回:
     int: 符合条件的股票数量
     """
-
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
     try:
-        with connection.cursor() as cursor:
-            # 查询昨日涨停的股票数据
-            query = """
-                SELECT *
-                FROM stock_model
-                where date = %s 
-                and code = %s
-            """
-            cursor.execute(query, (date,code))
-            return cursor.fetchall()
+        # 查询昨日涨停的股票数据
+        query = """
+            SELECT *
+            FROM stock_model
+            where date = :date 
+            and code = :code
+        """
+        return db.fetch_all(query, {"date": date, "code": code})
 
     except Exception as e:
         print(f"查询昨日涨停股票时出错: {e}")
         return []
 
-    finally:
-        if connection:
-            connection.close()
-
 
 def get_regx_data(query):
-    db_config = {
-        'host': 'mysql-tt.dingteam.com',
-        'user': 'dingteam_ops',
-        'password': 'GdTtsy1qNJ0RTfgceblzUFNLS2AH5qQi',
-        'database': 'dingteam_ops'
-    }
-
-    # 连接数据库
-    connection = pymysql.connect(
-        host=db_config['host'],
-        user=db_config['user'],
-        password=db_config['password'],
-        database=db_config['database'],
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
     try:
-        with connection.cursor() as cursor:
-            # 查询昨日涨停的股票数据
-            
-            cursor.execute(query)
-            return cursor.fetchall()
+        # 查询昨日涨停的股票数据
+        
+        return db.fetch_all(query)
 
     except Exception as e:
         print(f"查询昨日涨停股票时出错: {e}")
         return 0
 
-    finally:
-        if connection:
-            connection.close()
-
 if __name__ == "__main__":
     # 设置默认日期，实际使用时可以修改
     # date = "2025-11-27"  # 示例日期，实际使用时请提供有效日期
@@ -0,0 +1,98 @@
+"""
+分笔数据本地归档
+
+每次获取的 ak.stock_zh_a_tick_tx_js 分笔数据按 日期/代码 写入压缩的 Parquet 文件:
+    {TICK_ARCHIVE_DIR}/{yyyy-mm-dd}/{code}.parquet
+归档根目录下的 manifest.jsonl 记录每个文件的日期、代码、笔数、涨停价和写入时间，
+检测逻辑调整后可以直接基于归档离线重算，无需再次请求网络。
+"""
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+ARCHIVE_DIR = os.getenv(
+    "TICK_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ticks")
+)
+MANIFEST_NAME = "manifest.jsonl"
+COMPRESSION = "zstd"
+
+
+def archive_path(date, code, root=None):
+    """归档文件路径，date 为 yyyy-mm-dd 格式"""
+    return os.path.join(root or ARCHIVE_DIR, str(date), f"{code}.parquet")
+
+
+def has_ticks(date, code, root=None):
+    return os.path.exists(archive_path(date, code, root))
+
+
+def load_ticks(date, code, root=None):
+    """
+    读取归档的分笔数据
+
+    返回:
+    DataFrame | None: 未归档时返回 None
+    """
+    path = archive_path(date, code, root)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def save_ticks(date, code, tick_df, limit_price=None, root=None):
+    """
+    写入分笔数据并追加 manifest 记录，先写临时文件再替换，避免中断时留下半个文件
+
+    参数:
+    date: 日期 (yyyy-mm-dd格式)
+    code: 股票代码
+    tick_df: 分笔数据DataFrame
+    limit_price: 当日涨停价，重算事件时需要
+    """
+    root = root or ARCHIVE_DIR
+    path = archive_path(date, code, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    tick_df.reset_index(drop=True).to_parquet(tmp_path, compression=COMPRESSION, index=False)
+    os.replace(tmp_path, path)
+
+    entry = {
+        'date': str(date),
+        'code': code,
+        'rows': int(len(tick_df)),
+        'limit_price': float(limit_price) if limit_price is not None else None,
+        'bytes': os.path.getsize(path),
+        'archived_at': datetime.now().isoformat(timespec='seconds')
+    }
+    with open(os.path.join(root, MANIFEST_NAME), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return path
+
+
+def read_manifest(start_date=None, end_date=None, root=None):
+    """
+    读取 manifest，同一 (date, code) 多次归档时取最后一条
+
+    参数:
+    start_date: 开始日期 (yyyy-mm-dd格式，含)
+    end_date: 结束日期 (yyyy-mm-dd格式，含)
+
+    返回:
+    DataFrame: date, code, rows, limit_price, bytes, archived_at
+    """
+    columns = ['date', 'code', 'rows', 'limit_price', 'bytes', 'archived_at']
+    manifest_path = os.path.join(root or ARCHIVE_DIR, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return pd.DataFrame(columns=columns)
+    manifest = pd.read_json(manifest_path, lines=True, dtype={'date': str, 'code': str}, convert_dates=False)
+    if manifest.empty:
+        return pd.DataFrame(columns=columns)
+    manifest = manifest.drop_duplicates(['date', 'code'], keep='last')
+    if start_date is not None:
+        manifest = manifest[manifest['date'] >= str(start_date)]
+    if end_date is not None:
+        manifest = manifest[manifest['date'] <= str(end_date)]
+    return manifest.sort_values(['date', 'code']).reset_index(drop=True)[columns]
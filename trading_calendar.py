@@ -0,0 +1,168 @@
+"""
+A股交易日历
+
+交易日来自 ak.tool_trade_date_hist_sina，缓存为本地 CSV，进程内只加载一次。
+本地缓存缺失或已过期 (不含今天之后的日期) 时重新下载；下载失败时继续使用过期的缓存，
+只有没有缓存时才退化为周一至周五的工作日历，两种情况都打印警告。
+
+缓存文件位置: TRADING_CALENDAR_PATH，默认 ./data/trading_calendar.csv
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_PATH = os.getenv(
+    "TRADING_CALENDAR_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trading_calendar.csv")
+)
+
+# 进程内缓存的交易日，datetime64[D] 升序数组
+_trade_days = None
+
+
+def _download():
+    import akshare as ak
+
+    df = ak.tool_trade_date_hist_sina()
+    return pd.to_datetime(df['trade_date']).values.astype('datetime64[D]')
+
+
+def _weekday_fallback():
+    today = pd.Timestamp.now().normalize()
+    return pd.bdate_range('1990-12-19', f"{today.year + 1}-12-31").values.astype('datetime64[D]')
+
+
+def load_calendar(refresh=False):
+    """
+    加载交易日历
+
+    参数:
+    refresh: 为 True 时忽略缓存重新下载
+
+    返回:
+    numpy.ndarray: datetime64[D] 升序交易日
+    """
+    global _trade_days
+    if _trade_days is not None and not refresh:
+        return _trade_days
+
+    today = np.datetime64(pd.Timestamp.now().normalize().date(), 'D')
+    days = None
+    # 过期的缓存仍是真实的交易所日历，下载失败时优先于工作日历
+    stale = None
+    if os.path.exists(CALENDAR_PATH):
+        cached = pd.to_datetime(pd.read_csv(CALENDAR_PATH)['trade_date']).values.astype('datetime64[D]')
+        if len(cached) > 0:
+            if refresh or cached[-1] <= today:
+                stale = cached
+            else:
+                days = cached
+    if days is None:
+        try:
+            days = _download()
+            os.makedirs(os.path.dirname(CALENDAR_PATH), exist_ok=True)
+            pd.DataFrame({'trade_date': pd.DatetimeIndex(days).strftime('%Y-%m-%d')}).to_csv(CALENDAR_PATH, index=False)
+        except Exception as e:
+            if stale is not None:
+                logging.warning("download trading calendar failed, using stale cache ending %s: %s", stale[-1], e)
+                days = stale
+            else:
+                logging.warning("download trading calendar failed, fall back to weekdays: %s", e)
+                days = _weekday_fallback()
+    _trade_days = np.unique(days)
+    return _trade_days
+
+
+def _to_day(date):
+    return np.datetime64(pd.Timestamp(date).date(), 'D')
+
+
+def _at(idx):
+    days = load_calendar()
+    if idx < 0 or idx >= len(days):
+        return None
+    return pd.Timestamp(days[idx])
+
+
+def is_trading_day(date):
+    days = load_calendar()
+    day = _to_day(date)
+    idx = np.searchsorted(days, day)
+    return bool(idx < len(days) and days[idx] == day)
+
+
+def next_trading_day(date):
+    """
+    返回:
+    Timestamp | None: date 之后 (不含当天) 的第一个交易日，超出日历范围时返回 None
+    """
+    return _at(int(np.searchsorted(load_calendar(), _to_day(date), side='right')))
+
+
+def prev_trading_day(date):
+    """
+    返回:
+    Timestamp | None: date 之前 (不含当天) 的最后一个交易日
+    """
+    return _at(int(np.searchsorted(load_calendar(), _to_day(date), side='left')) - 1)
+
+
+def offset_trading_day(date, n):
+    """
+    向前或向后偏移 n 个交易日
+
+    参数:
+    date: 日期
+    n: 偏移量，正数向后，负数向前；为0时 date 是交易日则返回 date，否则返回下一个交易日
+
+    返回:
+    Timestamp | None: 超出日历范围时返回 None
+    """
+    days = load_calendar()
+    day = _to_day(date)
+    if n > 0:
+        return _at(int(np.searchsorted(days, day, side='right')) + n - 1)
+    return _at(int(np.searchsorted(days, day, side='left')) + n)
+
+
+def trading_days_between(start_date, end_date):
+    """
+    返回:
+    DatetimeIndex: [start_date, end_date] 内的交易日 (含两端)
+    """
+    days = load_calendar()
+    lo = np.searchsorted(days, _to_day(start_date), side='left')
+    hi = np.searchsorted(days, _to_day(end_date), side='right')
+    return pd.DatetimeIndex(days[lo:hi])
+
+
+def next_trading_days(dates):
+    """
+    next_trading_day 的批量版本
+
+    参数:
+    dates: 日期序列
+
+    返回:
+    DatetimeIndex: 与 dates 对应的下一个交易日，超出日历范围为 NaT
+    """
+    days = load_calendar()
+    values = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+    idx = np.searchsorted(days, values, side='right')
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    valid = idx < len(days)
+    result[valid] = days[idx[valid]]
+    return pd.DatetimeIndex(result)
+
+
+def last_closed_day():
+    """
+    收盘数据在 16 点后才完整，之前只把昨天及以前视为已收盘
+
+    返回:
+    Timestamp: 已收盘的最后一个自然日 (不一定是交易日)
+    """
+    now = pd.Timestamp.now()
+    return now.normalize() if now.hour >= 16 else now.normalize() - pd.Timedelta(days=1)